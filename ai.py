@@ -16,7 +16,8 @@ import os
 
 ai_client = openai.OpenAI()
 
-def request_ai(prompt, frames=None):
+# frames 可以是 PIL 图像或已编码的 JPEG 数据
+def request_ai(prompt, frames=None, model="gpt-4o-mini"):
     print("AI request:", prompt)
     content = [ {"type": "text", "text": prompt} ]
 
@@ -25,15 +26,17 @@ def request_ai(prompt, frames=None):
         #content.append({"type": "video", "video": videos})
 
         for i, frame in enumerate(frames):
-            buffered = BytesIO()
-            frame.save(buffered, format="JPEG")
-            base64_frame = base64.b64encode(buffered.getvalue()).decode("utf-8")
+            if not isinstance(frame, bytes):
+                buffered = BytesIO()
+                frame.save(buffered, format="JPEG")
+                frame = buffered.getvalue()
+            base64_frame = base64.b64encode(frame).decode("utf-8")
             content.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_frame}"}})
             #videos.append(f"data:image/jpeg;base64,{base64_frame}")
 
     response = ai_client.chat.completions.create(
         #model="qwen-vl-max-latest",
-        model="gpt-4o-mini",
+        model=model,
         temperature=0.9,
         max_tokens=100,
         messages=[{ "role": "user", "content": content } ],
@@ -43,19 +46,84 @@ def request_ai(prompt, frames=None):
     print("AI response:", text)
     return text
 
+CHAT_KEEP_EXCHANGES = 6
+CHAT_TOKEN_BUDGET = 4000
+
+
+# 对话上下文有界的聊天: 每次只发送系统提示、比赛进程摘要和最近 keep 轮问答，
+# 总量超过 token_budget 时再丢弃更早的问答，每次请求的 token 数不随比赛进行而增长
 class ChatAI:
-    def __init__(self, model="gpt-4o-mini"):
+    def __init__(self, model="gpt-4o-mini", system=None, keep=CHAT_KEEP_EXCHANGES, token_budget=CHAT_TOKEN_BUDGET, cache=None):
         self.model = model
-        self.messages = []
+        self.cache = cache
+        self.system = system
+        self.keep = keep
+        self.token_budget = token_budget
+        self.summary = None
+        self.exchanges = []
+        self.stats = {'calls': 0, 'cache_hits': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
 
-    def chat(self, prompt):
+    # context_key 区分提示相同但位置不同的请求（如多个 Idle 解说），作为缓存键的一部分
+    def chat(self, prompt, context_key=None):
         print("chat:", prompt)
-        self.messages.append({"role": "user", "content": prompt})
-        response = ai_client.chat.completions.create(
-            model=self.model,
-            messages=self.messages,
-        )
-        self.messages.append({"role": "assistant", "content": response.choices[0].message.content})
-        result = response.choices[0].message.content
+        cache_key = self.cache.key(self.model, self.system, self.summary, prompt, context_key) if self.cache else None
+        result = self.cache.get(cache_key) if cache_key else None
+        if result is not None:
+            self.stats['cache_hits'] += 1
+        else:
+            messages = self.context(prompt)
+            response = ai_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+            )
+            result = response.choices[0].message.content
+            self.report(response, messages)
+            if cache_key:
+                self.cache.put(cache_key, self.model, prompt, result)
+        self.exchanges.append((prompt, result))
+        del self.exchanges[:-self.keep or len(self.exchanges)]
         print("chat result:", result)
-        return result
\ No newline at end of file
+        return result
+
+    # 组装本次请求的消息
+    def context(self, prompt):
+        head = []
+        if self.system:
+            head.append({"role": "system", "content": self.system})
+        if self.summary:
+            head.append({"role": "system", "content": f"比赛进程摘要：\n{self.summary}"})
+        tail = [{"role": "user", "content": prompt}]
+
+        budget = self.token_budget - sum(estimate_tokens(m["content"]) for m in head + tail)
+        history = []
+        for user, assistant in reversed(self.exchanges[-self.keep:] if self.keep else []):
+            cost = estimate_tokens(user) + estimate_tokens(assistant)
+            if cost > budget:
+                break
+            budget -= cost
+            history[:0] = [{"role": "user", "content": user}, {"role": "assistant", "content": assistant}]
+        return head + history + tail
+
+    def report(self, response, messages):
+        usage = getattr(response, 'usage', None)
+        prompt_tokens = usage.prompt_tokens if usage else sum(estimate_tokens(m["content"]) for m in messages)
+        completion_tokens = usage.completion_tokens if usage else 0
+        self.stats['calls'] += 1
+        self.stats['prompt_tokens'] += prompt_tokens
+        self.stats['completion_tokens'] += completion_tokens
+        print(f"chat tokens: sent {prompt_tokens} ({len(messages)} messages), received {completion_tokens}, "
+              f"average sent {self.stats['prompt_tokens'] / self.stats['calls']:.0f}")
+
+    # 撤销最近一次问答，并删除它的缓存
+    def undo(self, context_key=None):
+        if self.exchanges:
+            prompt, _ = self.exchanges.pop()
+            if self.cache:
+                self.cache.delete(self.cache.key(self.model, self.system, self.summary, prompt, context_key))
+
+
+# 粗略估计 token 数: 中文按每字一个 token，其它字符按四个一个 token
+def estimate_tokens(text):
+    text = text or ''
+    wide = sum(1 for c in text if ord(c) > 0x7f)
+    return wide + (len(text) - wide + 3) // 4 + 4
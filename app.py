@@ -1,6 +1,7 @@
 from comments_edit import edit
 from editor import Editor
-from event_analyzer import EventAnalyzer
+from voicer import Voicer
+from event_analyzer import EventAnalyzer, BATCH_SIZE
 from game import Game
 import yaml
 import os
@@ -10,6 +11,9 @@ from utils import format_time
 import argparse
 import mark
 from clips import create_goal_clips
+from highlights import create_highlights
+from describe import describe_events
+from game_store import GameStore
 
 logging.basicConfig(
     level=logging.INFO,
@@ -25,7 +29,7 @@ def main():
     parser.add_argument(
         "action",
         type=str,
-        choices=["mark", "preview", "analyze", "edit", "make", "clean", "goals"],
+        choices=["mark", "preview", "analyze", "edit", "make", "clean", "goals", "highlights", "describe"],
         help="""要执行的操作：
 
 mark: 在原始比赛视频中标记事件
@@ -34,6 +38,9 @@ preview: 预览比赛视频中配音解说的部分
 make: 创建并保存比赛视频和集锦
 clean: 删除该比赛生成的中间文件
 edit: 编辑解说文字
+goals: 生成进球集锦
+highlights: 生成精彩瞬间集锦
+describe: 根据视频画面自动填写没有描述的事件
 """,
         metavar="action"
     )
@@ -43,6 +50,41 @@ edit: 编辑解说文字
         help="比赛配置文件的路径（YAML格式）",
         metavar="game"
     )
+    parser.add_argument(
+        "-j", "--workers",
+        type=int,
+        default=None,
+        help="并行数：make 时渲染的进程数（按关键帧切分视频，默认1）；preview 时渲染片段的并发数（默认CPU核数）",
+    )
+    parser.add_argument(
+        "-p", "--pipeline",
+        type=int,
+        default=0,
+        help="make 时使用流水线渲染（解码、叠加、编码并行），指定叠加进程数",
+    )
+    parser.add_argument(
+        "-i", "--incremental",
+        action="store_true",
+        help="make 时增量渲染：视频按固定时长分段，只重新渲染输入有变化的片段",
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        choices=["cv2", "ffmpeg"],
+        default="cv2",
+        help="make 的渲染方式：cv2 逐帧渲染；ffmpeg 生成 filter_complex 一次渲染",
+    )
+    parser.add_argument(
+        "-b", "--batch",
+        type=int,
+        default=BATCH_SIZE,
+        help=f"生成解说词时每次请求包含的事件数，1 表示逐条请求（默认 {BATCH_SIZE}）",
+    )
+    parser.add_argument(
+        "-s", "--stream",
+        action="store_true",
+        help="分析时每生成一条解说就立即提交配音合成，解说生成和配音合成同时进行",
+    )
     args = parser.parse_args()
 
     directory, filename = os.path.split(args.game)
@@ -60,34 +102,46 @@ edit: 编辑解说文字
         mark.mark(game.main_video, f'events.{game_id}.csv')
         return 1
 
+    # 在分析之前运行，分析会修改事件
+    if args.action == "describe":
+        describe_events(game, args.workers)
+        return 0
+
 
     analyzer = EventAnalyzer(game)
-    analyzer.analyze()
+    if args.stream:
+        voice_stream = Voicer(game).stream()
+        analyzer.analyze(args.batch, voice_stream.submit)
+        voice_stream.finish()
+    else:
+        analyzer.analyze(args.batch)
 
     start = time.time()
 
     if args.action == "preview":
         editor = Editor(game)
-        editor.preview()
+        editor.preview(args.workers)
     elif args.action == "make":
         editor = Editor(game)
-        editor.edit()
+        editor.edit(args.workers or 1, args.backend, args.pipeline, args.incremental)
     elif args.action == "clean":
         confirm = input("确定要删除该比赛生成的文件吗？(y/n): ").lower()
         if confirm == "y":
             os.remove(f"game.{game.game_id}.mp4")
             os.remove(f"highlights.{game.game_id}.mp4")
             os.remove(f"logo.{game.game_id}.mp4")
-            os.remove(f"game.{game.game_id}.pkl")
+            GameStore(game.game_id).remove()
             print(f"Game {game.game_id} cleaned")
     elif args.action == "analyze":
         # no more action needed
         return 0
     elif args.action == "edit":
-        edit(f"game.{game.game_id}.pkl")
+        edit(game.game_id)
         return 0
     elif args.action == "goals":
-        create_goal_clips(game)
+        create_goal_clips(game, args.workers)
+    elif args.action == "highlights":
+        create_highlights(game)
     else:
         print("unknown action:", args.action)
         return 1
@@ -0,0 +1,55 @@
+import subprocess
+import numpy as np
+from encoder import AUDIO_RATE, AUDIO_CHANNELS
+
+
+# 通过 ffmpeg 按块读取 PCM 音频 (int16, 交错双声道)，内存占用与文件长度无关
+class PCMReader:
+    def __init__(self, path, start=None, duration=None, loop=False, rate=AUDIO_RATE, channels=AUDIO_CHANNELS):
+        self.rate = rate
+        self.channels = channels
+        command = ['ffmpeg', '-v', 'error']
+        if loop:
+            command += ['-stream_loop', '-1']
+        if start is not None:
+            command += ['-ss', f"{start:.6f}"]
+        command += ['-i', path]
+        if duration is not None:
+            command += ['-t', f"{duration:.6f}"]
+        command += ['-vn', '-f', 's16le', '-ac', str(channels), '-ar', str(rate), '-']
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE)
+
+    # 读取 samples 个采样，不足的部分补静音
+    def read(self, samples):
+        size = samples * self.channels * 2
+        data = self.process.stdout.read(size) if self.process else b''
+        chunk = np.zeros((samples, self.channels), dtype=np.int16)
+        if data:
+            decoded = np.frombuffer(data, dtype=np.int16).reshape(-1, self.channels)
+            chunk[:len(decoded)] = decoded
+        return chunk
+
+    def close(self):
+        if self.process is not None:
+            self.process.stdout.close()
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# 把整个音频文件解码为 float32 数组（用于较短的配音）
+def decode_audio(path, rate=AUDIO_RATE, channels=AUDIO_CHANNELS):
+    result = subprocess.run(['ffmpeg', '-v', 'error', '-i', path, '-vn', '-f', 'f32le', '-ac', str(channels), '-ar', str(rate), '-'],
+                            stdout=subprocess.PIPE, check=True)
+    return np.frombuffer(result.stdout, dtype=np.float32).reshape(-1, channels)
+
+
+# float32 [-1, 1] 转为 int16，超出部分削波
+def to_int16(samples):
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
@@ -1,17 +1,80 @@
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from event import EventType
-from moviepy import VideoFileClip
 from utils import format_time
+from video_index import VideoIndex
+from segments import concat_videos
+from encoder import DEFAULT_CODEC, DEFAULT_CRF, DEFAULT_PRESET
 
 GOAL_BEFORE = 5
 GOAL_AFTER = 7
+SEEK_EPSILON = 0.001
 
-def create_goal_clips(game):
+
+def create_goal_clips(game, workers=None):
     goal_events = [e for e in game.events if e.type == EventType.Goal]
-    game_clip = VideoFileClip(f'game.{game.game_id}.mp4')
-    for event in goal_events:
-        goal_clip = game_clip.subclipped(event.time - GOAL_BEFORE, event.time + GOAL_AFTER)
+    source = f'game.{game.game_id}.mp4'
+    index = VideoIndex.load(source)
+
+    def create_goal_clip(event):
         time = format_time(event.time, 0, False)
         team = game.teams[event.team]
         player = event.player or 'NA'
-        goal_clip.write_videofile(f'goal-{game.game_id}-{time}-{team.name}-{player}.mp4', threads=32, fps=24)
+        output = f'goal-{game.game_id}-{time}-{team.name}-{player}.mp4'
+        smart_cut(index, source, event.time - GOAL_BEFORE, event.time + GOAL_AFTER, output, game.encoder)
+        return output
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        for output in executor.map(create_goal_clip, goal_events):
+            print(f"created goal clip {output}")
+
+
+# 智能剪切: 完全在区间内的 GOP 直接复制，只重新编码两端不完整的 GOP，
+# 再把剪切好的画面和重新编码的音频合并，保持原帧率。
+# 每一部分都按索引中的帧数截取 (-frames:v)，拼接处不会多出或重复帧
+def smart_cut(index, source, start, end, output, encoder=None):
+    encoder = encoder or {}
+    start = max(start, 0)
+    # 输出 [first, stop) 之间的帧: 开始时正在显示的帧到 end 之前的最后一帧
+    first = index.frame_at(start)
+    stop = index.frame_at(end)
+    if index.frame_time(stop) < end:
+        stop += 1
+    head_end = index.keyframe_after(first)
+    tail_start = index.keyframe_before(stop) if stop < len(index) else len(index)
+
+    parts = []
+    if head_end is None or head_end >= tail_start:
+        parts.append(('encode', first, stop))
+    else:
+        if head_end > first:
+            parts.append(('encode', first, head_end))
+        parts.append(('copy', head_end, tail_start))
+        if stop > tail_start:
+            parts.append(('encode', tail_start, stop))
+
+    part_paths = []
+    for i, (mode, part_first, part_stop) in enumerate(parts):
+        part_path = f"{output[:-len('.mp4')]}.part{i}.mp4"
+        part_start = index.frame_time(part_first)
+        if mode == 'copy':
+            # 复制从 part_first 这个关键帧开始
+            command = ['ffmpeg', '-y', '-v', 'error', '-ss', f"{part_start + SEEK_EPSILON:.6f}", '-i', source,
+                       '-frames:v', str(part_stop - part_first), '-an', '-c:v', 'copy', '-avoid_negative_ts', 'make_zero']
+        else:
+            # 精确定位只保留 PTS 不小于 -ss 的帧
+            command = ['ffmpeg', '-y', '-v', 'error', '-ss', f"{max(part_start - SEEK_EPSILON, 0):.6f}", '-i', source,
+                       '-frames:v', str(part_stop - part_first), '-an',
+                       '-c:v', encoder.get('codec', DEFAULT_CODEC), '-crf', str(encoder.get('crf', DEFAULT_CRF)),
+                       '-preset', encoder.get('preset', DEFAULT_PRESET), '-pix_fmt', 'yuv420p']
+        subprocess.run(command + [part_path], check=True)
+        part_paths.append(part_path)
+
+    video_path = f"{output[:-len('.mp4')]}.video.mp4"
+    concat_videos(part_paths, video_path)
+    subprocess.run(['ffmpeg', '-y', '-v', 'error', '-i', video_path, '-ss', f"{start:.6f}", '-t', f"{end - start:.6f}", '-i', source,
+                    '-map', '0:v', '-map', '1:a?', '-c:v', 'copy', '-c:a', 'aac', output], check=True)
 
+    for part_path in part_paths + [video_path]:
+        os.remove(part_path)
@@ -3,19 +3,21 @@ import yaml
 
 
 class Comment:
-    def __init__(self, time, text, type, event_id=None, event_level=0):
+    def __init__(self, time, text, type, event_id=None, event_level=0, slot=None, id=None):
         self.time = time
         self.text = text
         self.type = type
         self.event_id = event_id
         self.event_level = event_level
+        self.slot = slot
+        self.id = id
 
     def __str__(self):
         return f'{self.time}: {self.text}'
 
     @classmethod
     def from_dict(cls, obj):
-        return cls(obj['time'], obj['text'], obj['type'], obj.get('event_id'), obj.get('event_level'))
+        return cls(obj['time'], obj['text'], obj['type'], obj.get('event_id'), obj.get('event_level'), obj.get('slot'))
     
     @classmethod
     def load_from_yaml(cls, file_path):
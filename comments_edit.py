@@ -1,13 +1,13 @@
-import pickle
+from game_store import GameStore
 from utils import format_time, parse_time
 
 
-def edit(filename):
-    with open(filename, 'rb') as f:
-        game_data = pickle.load(f)
+def edit(game_id):
+    store = GameStore(game_id)
+    comments = store.comments()
 
     print('Comments:')
-    for i, comment in enumerate(game_data['comments']):
+    for i, comment in enumerate(comments):
         print(f"{i:02d}", format_time(comment.time), comment.text)
 
     while True:
@@ -17,7 +17,7 @@ def edit(filename):
         
         try:
             index = int(choice)
-            comment = game_data['comments'][index]
+            comment = comments[index]
         except:
             continue
         
@@ -38,9 +38,7 @@ def edit(filename):
         confirm = input("Save? (Yes/No)").upper()
 
         if confirm == "Y":
-            game_data['comments'][index] = comment
-            with open(filename, 'wb') as f:
-                pickle.dump(game_data, f)
+            store.update_comment(comment)
 
 
 
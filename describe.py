@@ -0,0 +1,78 @@
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from ai import request_ai
+from event import Event, EventType
+from replay import ReplayReader
+from video_index import VideoIndex
+from response_cache import ResponseCache
+from utils import format_time, file_signature
+
+DESCRIBE_BEFORE = 2
+DESCRIBE_AFTER = 2
+DESCRIBE_FRAMES = 4
+DESCRIBE_WIDTH = 512
+DESCRIBE_QUALITY = 80
+DESCRIBE_MODEL = 'gpt-4o-mini'
+DESCRIBE_WORKERS = 8
+
+
+# 自动填写事件描述: 每个事件只解码事件前后的少量帧，缩小后编码为 JPEG，
+# 连同事件信息发送给 AI。各事件在线程池中并行处理，结果按事件窗口和模型缓存
+def describe_events(game, workers=None):
+    events = [e for e in game.events if not e.desc and e.type not in (EventType.Comment, EventType.Start, EventType.End)]
+    if not events:
+        print("describe: no events without description")
+        return
+
+    cache = ResponseCache()
+    signature = file_signature(game.main_video)
+    index = VideoIndex.load(game.main_video)
+
+    def describe(event):
+        prompt = describe_prompt(game, event)
+        window = [max(event.time - DESCRIBE_BEFORE, 0), event.time + DESCRIBE_AFTER, DESCRIBE_FRAMES, DESCRIBE_WIDTH]
+        key = cache.key(DESCRIBE_MODEL, game.main_video, signature, window, prompt)
+        text = cache.get(key)
+        if text is None:
+            text = request_ai(prompt, sample_frames(game.main_video, index, *window), DESCRIBE_MODEL)
+            cache.put(key, DESCRIBE_MODEL, prompt, text)
+        return text.strip()
+
+    print(f"describe: {len(events)} events with {workers or DESCRIBE_WORKERS} workers")
+    with ThreadPoolExecutor(max_workers=workers or DESCRIBE_WORKERS) as executor:
+        for event, text in zip(events, executor.map(describe, events)):
+            print(f"{format_time(event.time)} {event.type.name}: {text}")
+            event.desc = text
+
+    Event.save_to_csv(f'events.{game.game_id}.csv', game.events)
+
+
+def describe_prompt(game, event):
+    prompt = f"这是一场足球比赛中“{event.type.event_name}”事件前后{DESCRIBE_BEFORE + DESCRIBE_AFTER}秒内按时间顺序截取的{DESCRIBE_FRAMES}帧画面。"
+    prompt += "参赛球队：" + "，".join(f"{t.name}队（{t.color}队服）" for t in game.teams) + "。"
+    if event.team is not None:
+        prompt += f"事件主体球队：{game.teams[event.team].name}队。"
+    if event.player:
+        prompt += f"队员：{event.player}。"
+    prompt += "请用一句话（不超过30字）客观描述画面中发生的事情，只回复描述本身。"
+    return prompt
+
+
+# 在 [start, end] 内均匀截取 count 帧，缩小到 width 宽后编码为 JPEG
+def sample_frames(video_path, index, start, end, count, width):
+    reader = ReplayReader(video_path, index)
+    try:
+        frames = []
+        for time in np.linspace(start, end, count):
+            frame = reader.read(index.frame_at(time))
+            if frame is None:
+                continue
+            height = int(frame.shape[0] * width / frame.shape[1]) // 2 * 2
+            small = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            ok, data = cv2.imencode('.jpg', small, [cv2.IMWRITE_JPEG_QUALITY, DESCRIBE_QUALITY])
+            if ok:
+                frames.append(data.tobytes())
+        return frames
+    finally:
+        reader.release()
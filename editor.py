@@ -1,23 +1,33 @@
+import hashlib
+import json
 import logging
-import subprocess
-from moviepy import VideoFileClip, AudioFileClip, CompositeVideoClip, CompositeAudioClip, ImageClip, concatenate_videoclips, TextClip
-from moviepy.video.fx import MultiplySpeed, Resize, CrossFadeIn, CrossFadeOut
-import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import os
 from voicer import Voicer
-from utils import format_time
+from utils import format_time, file_signature
 from event import Tag
+from replay import ReplayWindow, ReplayBuffer
+from segments import probe_keyframes, split_segments, split_segments_every, concat_videos
+from filtergraph import FilterGraph
+from sting import StingCache
+from encoder import FFmpegWriter
+from mixer import AudioMixer, VOICE_VOLUME
+from scheduler import schedule_comments, save_schedule
+from timeline import Timeline
+from pipeline import FramePipeline
+from preview import PreviewSegment, render_preview, PREVIEW_SETTINGS
 import cv2
 
-PREVIEW_BUFFER = 2
 DELAY_BEFORE_REPLAY = 6
 REPLAY_BUFFER = 2
 HIGHLIGHT_EXTEND = 3
-INTERRUPT_BUFFER = 0.5
 LOGO_STAY = 0.5
 LOGO_FLY = 0.8
-TEMP_VIDEO_NAME = 'temp.mp4'
-TEMP_AUDIO_NAME = 'temp.aac'
+OUTPUT_NAME = 'output.mp4'
+SCHEDULE_NAME = 'schedule.{}.json'
+RENDER_CACHE_DIR = os.path.join('.cache', 'render')
+RENDER_SEGMENT_DURATION = 60
+RENDER_VERSION = 1
 
 # 剪辑器
 class Editor:
@@ -25,238 +35,263 @@ class Editor:
     def __init__(self, game):
         self.game = game
         self.voicer = Voicer(game)
-        self.logo_clips = []
-        self.replay_clips = []
-        self.scoreboard_clips = []
-        self.comment_audio = None
-        self.current_score = None
-        self.logo_times = None
-        self.load_logo_video()
-    
-    def load_logo_video(self):
-        logo_video_cap = cv2.VideoCapture(self.game.logo_video)
-        fps = logo_video_cap.get(cv2.CAP_PROP_FPS)
-        frames = []
-        while True:
-            ret, frame = logo_video_cap.read()
-            if not ret:
-                break
-            frames.append(frame)
-
-        duration = len(frames) / fps
-        logo_video_cap.release()
-        self.logo_video = {"fps": fps, "duration": duration, "frames": frames}
-        print(f"loading logo video {self.game.logo_video} with {self.logo_video['fps']} fps and {self.logo_video['duration']} duration")
-
-    # 预览比赛视频中配音解说的部分
-    def preview(self):
-        self.add_comment_voices()
-        logging.info(f"comment audio duration: {self.comment_audio.duration}")
-
-        clips = []
-        for index, event in enumerate(self.game.events):
-            if event.type.level < 8:
-                continue
-            clip = self.main_video.subclipped(event.time - PREVIEW_BUFFER, event.time + PREVIEW_BUFFER)
-            clip.audio = self.comment_audio.subclipped(event.time - PREVIEW_BUFFER, event.time + PREVIEW_BUFFER)
-            text_clip = TextClip(text=f"event-{index}: {event.type} {format_time(event.time)}", font_size=24, color='white', font='ROGFonts-Regular_0.otf').with_duration(clip.duration)
-            clips.append(CompositeVideoClip([clip, text_clip.with_position(("center", "top"))]))
-
-        # 连接有解说的片段并保存为预览视频
-        concatenate_videoclips(clips).write_videofile('preview.mp4', threads=32, fps=16, preset='ultrafast')
-
-    def edit(self):
-        if not os.path.exists(TEMP_VIDEO_NAME):
-            self.create_output_video()
-        if not os.path.exists(TEMP_AUDIO_NAME):
-            self.create_output_audio()
-        self.add_audio()
-
-    def create_output_video(self):
+        self.logos = Timeline([], [])
+        self.replay_windows = []
+        self.scores = Timeline([], [])
+        self.sting = None
+
+    # 预览比赛视频中配音解说的部分: 每个事件单独渲染并缓存，只重新渲染有变化的片段
+    def preview(self, workers=None):
+        voices = Timeline.from_voices(self.plan_comment_voices())
+        # 配音音量与最终渲染一致
+        settings = {**PREVIEW_SETTINGS, 'voice_volume': self.game.mixer.get('voice_volume', VOICE_VOLUME)}
+        segments = [PreviewSegment(index, event, voices, self.game.main_video, settings)
+                    for index, event in enumerate(self.game.events) if event.type.level >= 8]
+        render_preview(segments, 'preview.mp4', workers or os.cpu_count())
+
+    def edit(self, workers=1, backend='cv2', overlay_workers=0, incremental=False):
+        if backend == 'ffmpeg':
+            self.render_filtergraph()
+            return
+
+        self.create_output_video(workers, overlay_workers, incremental)
+
+    # 用 ffmpeg filter_complex 一次渲染视频和音频，不逐帧经过 Python
+    def render_filtergraph(self):
+        self.probe_main_video()
+        self.prepare_render()
+        FilterGraph(self, LOGO_FLY / 2).run(OUTPUT_NAME)
+
+    def probe_main_video(self):
         cap = cv2.VideoCapture(self.game.main_video)
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        out = cv2.VideoWriter(TEMP_VIDEO_NAME, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        self.fps = cap.get(cv2.CAP_PROP_FPS)
+        self.frame_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.frame_total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+
+    def create_output_video(self, workers=1, overlay_workers=0, incremental=False):
+        self.probe_main_video()
+        frame_total = self.frame_total
+        self.prepare_render()
+        if self.sting is not None:
+            self.sting.prepare()
 
-        replay_events = self.calculate_replay_times()
+        if incremental:
+            self.render_incremental(workers)
+            return
+
+        # 视频帧和混合后的音频送入同一个 ffmpeg 进程，一次写出最终文件
+        if workers <= 1:
+            self.render_segment(0, frame_total, OUTPUT_NAME, audio=self.create_output_audio(), overlay_workers=overlay_workers)
+            return
+
+        segments = split_segments(probe_keyframes(self.game.main_video), self.fps, frame_total, workers)
+        segment_dir = f"segments.{self.game.game_id}"
+        os.makedirs(segment_dir, exist_ok=True)
+        paths = [os.path.join(segment_dir, f"{i:04d}.mp4") for i in range(len(segments))]
+        self.render_segments(segments, paths, workers)
+
+        concat_videos(paths, OUTPUT_NAME, audio=self.create_output_audio())
+        for path in paths:
+            os.remove(path)
+        os.rmdir(segment_dir)
+
+    # 增量渲染: 按固定时长切分，输入指纹未变的片段直接使用缓存
+    def render_incremental(self, workers):
+        segments = split_segments_every(probe_keyframes(self.game.main_video), self.fps, self.frame_total, RENDER_SEGMENT_DURATION)
+        os.makedirs(RENDER_CACHE_DIR, exist_ok=True)
+        paths = [os.path.join(RENDER_CACHE_DIR, f"{self.segment_fingerprint(start, end)}.mp4") for start, end in segments]
+        missing = [(segment, path) for segment, path in zip(segments, paths) if not os.path.exists(path)]
+        print(f"incremental render: {len(segments)} segments, {len(segments) - len(missing)} cached")
+
+        if missing:
+            temp_paths = [path[:-len('.mp4')] + f'.{os.getpid()}.tmp.mp4' for _, path in missing]
+            self.render_segments([segment for segment, _ in missing], temp_paths, workers)
+            for temp_path, (_, path) in zip(temp_paths, missing):
+                os.replace(temp_path, path)
+
+        concat_videos(paths, OUTPUT_NAME, audio=self.create_output_audio())
+
+    def render_segments(self, segments, paths, workers):
+        print(f"rendering {len(segments)} segments with {workers} workers")
+        if workers <= 1:
+            for (start, end), path in zip(segments, paths):
+                self.render_segment(start, end, path)
+                print(f"rendered frames {start}-{end}")
+            return
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_render_worker, initargs=(self,)) as executor:
+            futures = [executor.submit(render_segment_worker, start, end, path) for (start, end), path in zip(segments, paths)]
+            for future in as_completed(futures):
+                start, end = future.result()
+                print(f"rendered frames {start}-{end}")
+
+    # 片段指纹: 源帧区间、比分状态、重放和 logo 安排、叠加和编码参数
+    def segment_fingerprint(self, start_frame, end_frame):
+        start_time, end_time = start_frame / self.fps, end_frame / self.fps
+        scoreboard = self.game.scoreboard
+        current = self.scores.latest_before(start_time)
+        score_rows = ([current] if current else []) + self.scores.between(start_time, end_time)
+        scores = [(row.item.time, row.item.score0, row.item.score1) for row in score_rows]
+        data = {
+            'version': RENDER_VERSION,
+            'source': [self.game.main_video, file_signature(self.game.main_video), start_frame, end_frame, self.fps, self.frame_size],
+            'game': [self.game.start, self.game.end],
+            'scores': scores,
+            'replays': [[w.start, w.end, w.source_start, w.source_end] for w in self.replay_windows
+                        if w.start < end_frame and w.end > start_frame],
+            'logos': [row.time for row in self.logos.overlapping(start_time, end_time)],
+            'sting': self.sting.path if self.sting else None,
+            'scoreboard': [scoreboard.img, file_signature(scoreboard.img), scoreboard.texts,
+                           {k: v.__dict__ if v else None for k, v in scoreboard.textprops.items()}],
+            'encoder': self.game.encoder,
+        }
+        return hashlib.md5(json.dumps(data, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    # 计算渲染所需的状态（重放、logo、比分），渲染时只读
+    def prepare_render(self):
+        if os.path.exists(self.game.logo_video):
+            self.sting = StingCache(self.game.logo_video, self.frame_size, self.fps, LOGO_FLY, LOGO_STAY)
+        replay_events = self.calculate_replay_times() or []
         print(f"found {len(replay_events)} replay events")
+        self.replay_windows = [ReplayWindow(e, self.fps, REPLAY_BUFFER) for e in replay_events]
         self.calculate_logo_times(replay_events)
-        replay_frames = []
-        replay_time = None
-        processing_replay_event = None
-        frame_count = 0
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            time = frame_count / fps
-            if frame_count % 10 == 0:
-                print(f"frame {frame_count} / {cap.get(cv2.CAP_PROP_FRAME_COUNT)}", end="\r")
-
-            if processing_replay_event is None:
-                first_replay_event_time = len(replay_events) > 0 and replay_events[0].time or -100
-                if time > first_replay_event_time - REPLAY_BUFFER and time < first_replay_event_time + REPLAY_BUFFER:
-                    processing_replay_event = replay_events.pop(0)
-                    print(f"processing replay event {processing_replay_event.type.name} {format_time(processing_replay_event.time)}")
-                    replay_frame = frame.copy()
-                    replay_frames.append(replay_frame)
-                    replay_frames.append(replay_frame)
-            else:
-                if time > processing_replay_event.time - REPLAY_BUFFER and time < processing_replay_event.time + REPLAY_BUFFER:
-                    replay_frame = frame.copy()
-                    replay_frames.append(replay_frame)
-                    replay_frames.append(replay_frame)
-                else:
-                    print(f"processed replay event {processing_replay_event.type.name} {format_time(processing_replay_event.time)}")
-                    replay_time = processing_replay_event.replay_time
-                    processing_replay_event = None
-
-            if replay_time is not None and time > replay_time:
-                if len(replay_frames) > 0:
-                    frame = replay_frames.pop(0)
-                else:
-                    replay_time = None
-
-            frame_count += 1
-
-            self.draw_scoreboard(time, frame)
-            self.draw_logo(time, frame)
-            out.write(frame)
-
-        out.release()  # release the cv2's VideoWriter
-        cap.release()
-
+        self.scores = Timeline(self.game.score_updates, [u.time for u in self.game.score_updates])
+
+    # 渲染 [start_frame, end_frame) 之间的帧，每帧的状态只由帧号决定
+    def render_segment(self, start_frame, end_frame, path, audio=None, overlay_workers=0):
+        out = FFmpegWriter(path, self.fps, self.frame_size, audio=audio, **self.game.encoder)
+        if overlay_workers > 0:
+            FramePipeline(self, overlay_workers).run(start_frame, end_frame, out)
+        else:
+            for frame_count, frame in self.decode_frames(start_frame, end_frame):
+                self.draw_overlays(frame_count, frame)
+                out.write(frame)
+        out.release()
+        return start_frame, end_frame
+
+    # 解码主视频并替换重放帧；next_buffer 提供解码目标数组（流水线的共享内存槽位）
+    def decode_frames(self, start_frame, end_frame, next_buffer=None):
+        cap = cv2.VideoCapture(self.game.main_video)
+        if start_frame > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        # 只缓冲在本段内播放的重放
+        replay_windows = [w for w in self.replay_windows if w.start < end_frame and w.end > start_frame]
+        replay_buffer = ReplayBuffer(self.game.main_video, replay_windows, self.game.replay_memory * 1024 * 1024)
+
+        try:
+            for frame_count in range(start_frame, end_frame):
+                target = next_buffer() if next_buffer else None
+                ret, frame = cap.read(target)
+                if not ret:
+                    break
+                if target is not None and frame is not target:
+                    target[:] = frame
+                    frame = target
+
+                if frame_count % 10 == 0:
+                    print(f"frame {frame_count} / {end_frame}", end="\r")
+
+                replay_buffer.capture(frame_count, frame)
+                replay_window = self.replay_window_at(frame_count)
+                if replay_window is not None:
+                    replay_frame = replay_buffer.read(replay_window, frame_count)
+                    if replay_frame is not None:
+                        frame[:] = replay_frame
+                replay_buffer.release_finished(frame_count)
+
+                yield frame_count, frame
+        finally:
+            cap.release()
+            replay_buffer.release()
+
+    def draw_overlays(self, frame_count, frame):
+        time = frame_count / self.fps
+        self.draw_scoreboard(time, frame)
+        self.draw_logo(time, frame)
+
+    def replay_window_at(self, frame_index):
+        for window in self.replay_windows:
+            if window.contains(frame_index):
+                return window
+        return None
+
+    # 比赛原声和解说配音混合，返回 PCM 块供编码器读取
     def create_output_audio(self):
+        voices = self.plan_comment_voices()
+        for voice in voices:
+            logging.info(f"Adding voice for comment {voice['comment'].text} at {voice['start']}")
+        return AudioMixer(self.game.main_video, voices, self.frame_total / self.fps, **self.game.mixer).chunks()
+
+    # 安排解说配音并写出时间线，预览、渲染和 ffmpeg 后端使用同一份安排
+    def plan_comment_voices(self):
         self.voicer.make_voice()
-        audio_clips = [VideoFileClip(self.game.main_video).audio]
-        last_comment = None
-        for comment in self.game.comments:
-            if not comment.text:
-                continue
-            voice_path = self.voicer.get_voice(comment.text)["path"]
-            logging.info(f"voice path: {voice_path}")
-            voice_clip = AudioFileClip(voice_path).with_volume_scaled(2)
-            last_comment_end = last_comment.time + audio_clips[-1].duration if last_comment else 0
-            if comment.time < last_comment_end:
-                logging.info("overlapping comments, skipping lower level")
-                if comment.event_level < last_comment.event_level:
-                    logging.info(f"skipping comment {comment.text}")
-                    continue
-                if last_comment.time < comment.time - INTERRUPT_BUFFER:
-                    logging.info(f"interrupt last comment {last_comment.text}")
-                    audio_clips[-1] = audio_clips[-1].subclipped(0, comment.time - last_comment.time - INTERRUPT_BUFFER)
-                else:
-                    logging.info(f"skipping last comment {last_comment.text}")
-                    audio_clips.pop()
-                    last_comment = None
-
-            logging.info(f"Adding voice for comment {comment.text} at {comment.time}")
-            audio_clips.append(voice_clip.with_start(comment.time))
-            last_comment = comment
-        CompositeAudioClip(audio_clips).write_audiofile(TEMP_AUDIO_NAME, codec="aac")
-
-    def add_audio(self):
-        command = f"ffmpeg -i {TEMP_VIDEO_NAME} -i {TEMP_AUDIO_NAME} -c:v copy -c:a aac -strict experimental output.mp4 -y"
-        subprocess.run(command, shell=True)
-        os.remove(TEMP_VIDEO_NAME)
-        os.remove(TEMP_AUDIO_NAME)
+        voices, timeline = schedule_comments(self.game.comments, self.voicer.get_voice)
+        save_schedule(voices, SCHEDULE_NAME.format(self.game.game_id))
+        return [{"comment": v.comment, "path": v.path, "start": v.start, "duration": v.duration} for v in timeline]
 
     def draw_scoreboard(self, time, frame):
         if time < self.game.start or time > self.game.end:
             return
 
-        if len(self.game.score_updates) > 0 and time > self.game.score_updates[0].time:
-            self.current_score = self.game.score_updates.pop(0)
-
-        if self.current_score is not None:
-            self.game.scoreboard.render_frame(frame, time - self.game.start, self.current_score.score0, self.current_score.score1)
+        # 最近一次在 time 之前的比分
+        row = self.scores.latest_before(time)
+        if row is not None:
+            current_score = row.item
+            self.game.scoreboard.render_frame(frame, time - self.game.start, current_score.score0, current_score.score1)
 
     def calculate_logo_times(self, replay_events):
-        self.logo_times = []
+        if self.sting is None:
+            self.logos = Timeline([], [])
+            return
+        logo_times = []
         for replay_event in replay_events:
-            self.logo_times.append(replay_event.replay_time - self.logo_video["duration"] / 2)
-            self.logo_times.append(replay_event.replay_time + REPLAY_BUFFER * 4 - self.logo_video["duration"] / 2)
+            logo_times.append(replay_event.replay_time - self.sting.duration / 2)
+            logo_times.append(replay_event.replay_time + REPLAY_BUFFER * 4 - self.sting.duration / 2)
+        self.logos = Timeline(logo_times, logo_times, duration=[self.sting.duration] * len(logo_times))
 
     def draw_logo(self, time, frame):
-        first_logo_time = len(self.logo_times) > 0 and self.logo_times[0] or None
+        row = self.logos.latest_before(time, inclusive=True)
+        if row is None:
+            return
 
-        if first_logo_time is None:
+        logo_time = time - row.time
+        if logo_time > self.sting.duration:
             return
 
-        if time > first_logo_time + self.logo_video["duration"]:
-            print(f"logo time {first_logo_time} + {self.logo_video['duration']} is past, popping logo time")
-            if len(self.logo_times) > 0:
-                self.logo_times.pop(0)
-            return;
-
-        if time >= first_logo_time:
-            logo_time = time - first_logo_time
-            logo_frame_index = int(logo_time * self.logo_video["fps"])
-            logo_frame = self.logo_video["frames"][logo_frame_index]
-            if logo_time < LOGO_FLY / 2:
-                alpha = 1 - logo_time / (LOGO_FLY / 2)
-            elif logo_time > self.logo_video["duration"] - LOGO_FLY / 2:
-                alpha = 1 - (self.logo_video["duration"] - logo_time) / (LOGO_FLY / 2)
-            else:
-                alpha = 0
-
-            cv2.addWeighted(frame, alpha, logo_frame, 1 - alpha, 0, frame)
-            cv2.putText(frame, f"logo time: {logo_time:.2f} frame: {logo_frame_index}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2)
-
-    # 创建重放片段
-    def create_replays(self):
-        # pick replay events
-        replay_events = self.calculate_replay_times()
-        logging.info(f"found {len(replay_events)} replay events")
-        logo_video_duration = self.logo_video.duration
-
-        last_main_time = 0
-        for event in replay_events:
-            logging.info(f"Replay event {event.type.name}: {format_time(event.time)}")
-            logo_clip_before = self.logo_video.with_start(event.replay_time - logo_video_duration / 2).with_position(("center", "center")).with_effects([CrossFadeIn(LOGO_FLY / 2).copy(), CrossFadeOut(LOGO_FLY / 2).copy()])
-            replay_clip = self.main_video.subclipped(event.time - REPLAY_BUFFER, event.time + REPLAY_BUFFER).without_audio().with_effects([MultiplySpeed(0.5)]).with_start(event.replay_time)
-            logo_clip_after = self.logo_video.with_start(replay_clip.end - logo_video_duration / 2).with_position(("center", "center")).with_effects([CrossFadeIn(LOGO_FLY / 2).copy(), CrossFadeOut(LOGO_FLY / 2).copy()])
-
-            self.replay_clips.append(replay_clip)
-            self.logo_clips.append(logo_clip_before)
-            self.logo_clips.append(logo_clip_after)
+        self.sting.apply(frame, logo_time)
 
     # 计算重放片段的时间
     def calculate_replay_times(self):
-        # 获取所有需要重放的事件
-        replay_events = [e for e in self.game.events if Tag.Replay in e.tags]
+        # 获取所有需要重放的事件（按时间排序）
+        replay_events = Timeline.from_events(self.game.events).with_tag(Tag.Replay).items
         if not replay_events:
             return
 
         # 获取所有deadball时间段
-        deadballs = self.game.deadballs
+        deadballs = sorted(self.game.deadballs, key=lambda x: x.start)
         if not deadballs:
             return
 
-        # 按时间正序排序deadball和重放事件
-        deadballs.sort(key=lambda x: x.start)
-        replay_events.sort(key=lambda x: x.time)
-
         replay_duration = REPLAY_BUFFER * 2 * 2
 
+        # 按时间顺序扫描: 栈顶是当前 deadball 之前最近的、还没有安排重放的事件
+        pending = []
+        next_event = 0
         for deadball in deadballs:
             logging.info(f"calculate replay in deadball [{format_time(deadball.start)}-{format_time(deadball.end)}]")
+            while next_event < len(replay_events) and replay_events[next_event].time <= deadball.start:
+                if replay_events[next_event].replay_time is None:
+                    pending.append(replay_events[next_event])
+                next_event += 1
+
             # 如果deadball时间太短，跳过
             if deadball.duration < replay_duration:
                 logging.info("duration is too short, skipping")
                 continue
             
             # 找到deadball之前最近的事件
-            nearest_event = None
-            for event in replay_events:
-                if event.time <= deadball.start:
-                    if event.replay_time is None:
-                        nearest_event = event
-                else:
-                    break
+            nearest_event = pending.pop() if pending else None
             
             if nearest_event:
                 # 计算居中播放的时间
@@ -266,46 +301,13 @@ class Editor:
         
         return [e for e in replay_events if e.replay_time]
 
-    # 创建精彩瞬间片段
-    def create_hightlights_clip(self, game_clip, type=None, comment=None):
-        clips = []
-        logo_clips = []
-        last_highlight_end = 0
-
-        for event in self.game.events:
-            if Tag.Replay in event.tags:
-                logo_clips.append(self.create_logo_clip(last_highlight_end))
-                highlight_clip = game_clip.subclipped(event.time - REPLAY_BUFFER, event.time + REPLAY_BUFFER + HIGHLIGHT_EXTEND).with_start(last_highlight_end)
-                clips.append(highlight_clip)
-                replay_clip = game_clip.subclipped(event.time - REPLAY_BUFFER, event.time + REPLAY_BUFFER).with_effects([MultiplySpeed(0.5)]).without_audio().with_start(highlight_clip.end)
-                clips.append(replay_clip)
-                last_highlight_end = replay_clip.end
-
-        highlights_clip = CompositeVideoClip(clips + logo_clips)
-        audio_clips = [highlights_clip.audio]
-
-        if comment:
-            voice = self.voicer.make_text_voice(comment)
-            voice_clip = AudioFileClip(voice).with_volume_scaled(2)
-            audio_clips.append(voice_clip)
-            audio_clips[0] = audio_clips[0].subclipped(voice_clip.duration, audio_clips[0].duration).with_start(voice_clip.duration)
-
-        if self.bgm:
-            bgm_clips = []
-            last_bgm_end = 0
-
-            while last_bgm_end < highlights_clip.duration:
-                if highlights_clip.end - last_bgm_end > self.bgm.duration:
-                    current_bgm_clip = self.bgm.copy()
-                else:
-                    current_bgm_clip = self.bgm.subclipped(0, highlights_clip.duration - last_bgm_end)
-
-                bgm_clips.append(current_bgm_clip.with_start(last_bgm_end))
-                last_bgm_end = bgm_clips[-1].end
-                
-            audio_clips.extend(bgm_clips)
-
-        if len(audio_clips) > 1:
-            highlights_clip.audio = CompositeAudioClip(audio_clips)
-
-        return highlights_clip
+
+# 并行渲染的工作进程持有一份剪辑器
+_render_editor = None
+
+def init_render_worker(editor):
+    global _render_editor
+    _render_editor = editor
+
+def render_segment_worker(start_frame, end_frame, path):
+    return _render_editor.render_segment(start_frame, end_frame, path)
@@ -0,0 +1,96 @@
+import os
+import subprocess
+import tempfile
+import threading
+import wave
+
+AUDIO_RATE = 44100
+AUDIO_CHANNELS = 2
+DEFAULT_CODEC = 'libx264'
+DEFAULT_CRF = 18
+DEFAULT_PRESET = 'medium'
+
+
+# 把 PCM 音频块 (int16, 交错双声道) 作为 ffmpeg 的一个输入
+# POSIX 上通过管道传给同一个 ffmpeg 进程，Windows 不支持传递文件描述符，写入临时 wav
+class AudioFeeder:
+    def __init__(self, chunks, rate=AUDIO_RATE, channels=AUDIO_CHANNELS):
+        self.chunks = chunks
+        self.rate = rate
+        self.channels = channels
+        self.read_fd = None
+        self.write_fd = None
+        self.temp_path = None
+        self.thread = None
+        self.error = None
+
+    def input_args(self):
+        if os.name == 'nt':
+            self.write_temp()
+            return ['-i', self.temp_path]
+
+        self.read_fd, self.write_fd = os.pipe()
+        return ['-thread_queue_size', '1024', '-f', 's16le', '-ar', str(self.rate), '-ac', str(self.channels), '-i', f'pipe:{self.read_fd}']
+
+    def pass_fds(self):
+        return (self.read_fd,) if self.read_fd is not None else ()
+
+    def start(self):
+        if self.read_fd is None:
+            return
+        os.close(self.read_fd)
+        self.thread = threading.Thread(target=self.feed, daemon=True)
+        self.thread.start()
+
+    def feed(self):
+        try:
+            with os.fdopen(self.write_fd, 'wb') as pipe:
+                for chunk in self.chunks:
+                    pipe.write(chunk.tobytes())
+        except Exception as e:
+            self.error = e
+
+    def write_temp(self):
+        fd, self.temp_path = tempfile.mkstemp(suffix='.wav', dir='.')
+        os.close(fd)
+        with wave.open(self.temp_path, 'wb') as f:
+            f.setnchannels(self.channels)
+            f.setsampwidth(2)
+            f.setframerate(self.rate)
+            for chunk in self.chunks:
+                f.writeframes(chunk.tobytes())
+
+    def finish(self):
+        if self.thread is not None:
+            self.thread.join()
+        if self.temp_path is not None:
+            os.remove(self.temp_path)
+        if self.error is not None:
+            raise self.error
+
+
+# 把原始帧写入 ffmpeg 进程编码，和 cv2.VideoWriter 用法相同
+class FFmpegWriter:
+    def __init__(self, path, fps, frame_size, codec=DEFAULT_CODEC, crf=DEFAULT_CRF, preset=DEFAULT_PRESET, audio=None):
+        width, height = frame_size
+        self.audio = AudioFeeder(audio) if audio is not None else None
+        command = ['ffmpeg', '-y', '-v', 'error',
+                   '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}', '-r', str(fps), '-i', '-']
+        if self.audio is not None:
+            command += self.audio.input_args()
+            command += ['-map', '0:v', '-map', '1:a', '-c:a', 'aac']
+        command += ['-c:v', codec, '-crf', str(crf), '-preset', preset, '-pix_fmt', 'yuv420p', path]
+
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, pass_fds=self.audio.pass_fds() if self.audio else ())
+        if self.audio is not None:
+            self.audio.start()
+
+    def write(self, frame):
+        self.process.stdin.write(frame.data)
+
+    def release(self):
+        self.process.stdin.close()
+        if self.audio is not None:
+            self.audio.finish()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with code {self.process.returncode}")
@@ -95,3 +95,8 @@ class Event:
 
     def __repr__(self):
         return f'id: {self.id}, type: {self.type}, time: {format_time(self.time)}, team: {self.team}, player: {self.player}, desc: {self.desc}, tags: {self.tags}'
+
+
+# 事件中影响解说的字段，用于和上次分析比较
+def event_signature(event):
+    return [event.type.name, event.time, event.team, event.player, event.desc, [t.name for t in event.tags or []]]
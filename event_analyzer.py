@@ -1,13 +1,17 @@
+import hashlib
+import json
 import random
-import pickle
-import os
 from comment import Comment
 from ai import ChatAI
-from event import EventType, Tag
+from response_cache import ResponseCache
+from game_store import GameStore
+from event import EventType, Tag, event_signature
 from deadball import Deadball
+from utils import format_time
 
 IDLE_COMMENT_TIME = 30
 BATCH_SIZE = 10
+SUMMARY_EVENTS = 10
 
 # 事件分析器
 class EventAnalyzer:
@@ -15,16 +19,35 @@ class EventAnalyzer:
     def __init__(self, game):
         self.game = game
         self.current_deadball = None
+        self.on_comment = None
 
     # 分析事件(生成解说词, 更新比分, 更新死球状态)
-    def analyze(self):
-        if os.path.exists(f'game.{self.game.game_id}.pkl'):
-            with open(f'game.{self.game.game_id}.pkl', 'rb') as f:
-                game_data = pickle.load(f)
-                comments = self.game.comments = game_data['comments']
-                self.game.score_updates = game_data['score_updates']
-                self.game.deadballs = game_data['deadballs']
-            return
+    # 事件与上次分析相比没有变化时直接使用上次的结果，否则重新分析，
+    # 只有新增或变化的事件以及受影响的空闲时段需要调用 AI
+    # on_comment: 每条解说有文字后立即回调（如提交给配音合成），不必等待全部生成
+    def analyze(self, batch_size=BATCH_SIZE, on_comment=None):
+        self.on_comment = on_comment
+        signatures = {event.id: event_signature(event) for event in self.game.events}
+        reuse = {}
+        store = GameStore(self.game.game_id)
+        if store.exists():
+            previous = store.events()
+            if previous is None:
+                # 旧版本导入的结果没有事件签名: 和旧版本一样沿用已有解说（包括手动编辑过的），
+                # 并记录当前事件，之后修改事件时增量分析
+                print("analysis imported without event signatures, keeping its comments")
+                store.set_events(signatures)
+                previous = signatures
+            if previous == signatures:
+                comments = self.game.comments = store.comments()
+                self.game.score_updates = store.score_updates()
+                self.game.deadballs = store.deadballs()
+                for comment in comments:
+                    self.emit(comment)
+                store.close()
+                return
+            log_event_changes(previous, signatures)
+            reuse = {c.slot: c.text for c in store.comments() if c.slot and c.text}
 
         comments = self.game.comments = []
         self.game.deadballs = []
@@ -36,8 +59,6 @@ class EventAnalyzer:
         game_info += f"其它信息：{self.game.description}\n" if self.game.description else ""
         game_info += f"其它要求：{self.game.comment_requirement}\n" if self.game.comment_requirement else ""
 
-        chat_ai = ChatAI()
-
         prompt = f"你是足球解说员\"{self.game.narrator}\"，我会发送给你比赛事件描述，每次请生成一行解说词。\n"
         prompt += "文字要求：\n"
         prompt += "1.提及球员名字时请用使用引号，可以省略球队和号码，如果不知道球员名字可以说xx队的x号。\n"
@@ -49,47 +70,100 @@ class EventAnalyzer:
         for event_type in EventType:
             prompt += f"{event_type.name}: {event_type.event_name} {'要求：' + event_type.req if event_type.req else ''}\n"
         prompt += "以下比赛信息供参考：\n" + game_info
-        prompt += "明白请回复\"ok\""
-        
-        chat_ai.chat(prompt)
 
+        chat_ai = ChatAI(system=prompt, cache=ResponseCache())
+
+        # 先按顺序生成所有解说的位置和提示，需要 AI 生成的解说暂时没有文字
+        pending = []
+        self.key_events = []
         last_comment_time = self.game.start
         for event in self.game.events:
             self.update_deadball(event)
             
             for time in range(int(last_comment_time + IDLE_COMMENT_TIME), int(event.time) - 10, int(IDLE_COMMENT_TIME)):
-                comments.append(Comment(time, chat_ai.chat("Idle"), 'Idle'))
+                pending.append((Comment(time, None, 'Idle', slot=slot_key('idle', time, self.summary())), "Idle", self.summary()))
 
             if event.type == EventType.Start:
                 intro_time = event.time - 30 if event.time - 30 > 0 else 0
-                comments.append(Comment(intro_time, chat_ai.chat("Intro"), 'event', event.id, event.type.level))
+                pending.append((Comment(intro_time, None, 'event', event.id, event.type.level, slot_key('intro', event.id, self.game.quarter)), "Intro", self.summary()))
             elif event.type == EventType.End:
                 if self.game.quarter < 4:
-                    comments.append(Comment(event.time, chat_ai.chat("EndQuater"),'event', event.id, event.type.level))
+                    pending.append((Comment(event.time, None, 'event', event.id, event.type.level, slot_key('end', event.id, self.summary())), "EndQuater", self.summary()))
                     continue
             elif event.type == EventType.Goal:
-                comments.append(Comment(event.time, shoot_text(), 'event', event.id, event.type.level))
+                self.add_comment(self.shoot_comment(event, reuse))
                 event.time += 1
                 self.game.update_score(event.time, event.team, self.game.teams[event.team].score + 1)
                 event.desc = (event.desc or '') + f", 比分被改写为{self.game.teams[0].score}:{self.game.teams[1].score}"
+                self.key_events.append(f"{format_time(event.time, 0)} {self.game.teams[event.team].name}队{event.player or ''}进球，比分{self.game.teams[0].score}:{self.game.teams[1].score}")
             elif event.type == EventType.Miss:
-                comments.append(Comment(event.time, shoot_text(), 'event', event.id, event.type.level))
+                self.add_comment(self.shoot_comment(event, reuse))
                 event.time += 1
             elif event.type == EventType.Comment:
-                comments.append(Comment(event.time, event.desc, 'event', event.id, event.type.level))
+                self.add_comment(Comment(event.time, event.desc, 'event', event.id, event.type.level))
                 continue
 
-            comments.append(self.event_comment(chat_ai, event))
+            prompt = self.event_prompt(event)
+            pending.append((Comment(event.time, None, 'event', event.id, event.type.level, slot_key('event', event.id, prompt)), prompt, self.summary()))
 
             last_comment_time = event.time
 
-        with open(f'game.{self.game.game_id}.pkl', 'wb') as f:
-            pickle.dump({'comments': comments, 'score_updates': self.game.score_updates, 'deadballs': self.game.deadballs}, f)
-
-    # 生成事件解说词
-    def event_comment(self, chat_ai, event):
-        text = chat_ai.chat(self.event_prompt(event))
-        return Comment(event.time, text, 'event', event.id, event.type.level)
+        # 上次分析中位置和提示都相同的解说直接沿用（包括手动编辑过的文字）
+        missing = []
+        for item in pending:
+            comment = item[0]
+            comment.text = reuse.get(comment.slot)
+            if comment.text:
+                self.add_comment(comment)
+            else:
+                missing.append(item)
+        print(f"analyze: {len(pending)} AI comments, {len(pending) - len(missing)} reused, generating {len(missing)}")
+
+        for i in range(0, len(missing), batch_size):
+            batch = missing[i:i + batch_size]
+            chat_ai.summary = batch[0][2]
+            for (comment, _, _), text in zip(batch, self.batch_comments(chat_ai, [prompt for _, prompt, _ in batch], [c.slot for c, _, _ in batch])):
+                comment.text = text
+                self.add_comment(comment)
+        comments.sort(key=lambda c: c.time)
+
+        store.save(comments, self.game.score_updates, self.game.deadballs, signatures)
+        store.close()
+
+    def add_comment(self, comment):
+        self.game.comments.append(comment)
+        self.emit(comment)
+
+    def emit(self, comment):
+        if self.on_comment is not None and comment.text:
+            self.on_comment(comment)
+
+    def shoot_comment(self, event, reuse):
+        slot = slot_key('shoot', event.id)
+        return Comment(event.time, reuse.get(slot) or shoot_text(), 'event', event.id, event.type.level, slot)
+
+    # 一次请求生成多条解说词，回复不是长度正确的 JSON 数组时逐条请求
+    def batch_comments(self, chat_ai, prompts, slots):
+        if len(prompts) == 1:
+            return [chat_ai.chat(prompts[0], slots[0])]
+
+        prompt = f"以下是{len(prompts)}个按时间顺序发生的比赛事件，请为每个事件生成一行解说词，"
+        prompt += f"只回复一个包含{len(prompts)}个字符串的 JSON 数组，按事件顺序排列，不要有其它内容：\n"
+        prompt += "\n".join(f"{i + 1}. {p}" for i, p in enumerate(prompts))
+        texts = parse_comment_list(chat_ai.chat(prompt, slots), len(prompts))
+        if texts is not None:
+            return texts
+
+        print(f"batch response invalid, falling back to {len(prompts)} single requests")
+        chat_ai.undo(slots)
+        return [chat_ai.chat(p, slot) for p, slot in zip(prompts, slots)]
+
+    # 比赛进程摘要: 当前比分和最近的进球
+    def summary(self):
+        text = f"当前比分：{self.game.teams[0].name}队{self.game.teams[0].score}:{self.game.teams[1].score}{self.game.teams[1].name}队"
+        if self.key_events:
+            text += "\n重要事件：\n" + "\n".join(self.key_events[-SUMMARY_EVENTS:])
+        return text
 
     # 生成事件解说词提示
     def event_prompt(self, event):
@@ -105,6 +179,32 @@ class EventAnalyzer:
             self.current_deadball = None
 
 
+# 解析 JSON 数组形式的解说词，数量不符或格式错误时返回 None
+def parse_comment_list(text, count):
+    start, end = text.find('['), text.rfind(']')
+    if start < 0 or end < start:
+        return None
+    try:
+        texts = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(texts, list) or len(texts) != count or not all(isinstance(t, str) and t.strip() for t in texts):
+        return None
+    return [t.strip() for t in texts]
+
+
+def log_event_changes(previous, current):
+    added = [i for i in current if i not in previous]
+    removed = [i for i in previous if i not in current]
+    changed = [i for i in current if i in previous and previous[i] != current[i]]
+    print(f"events changed since last analyze: {len(added)} new, {len(changed)} changed, {len(removed)} removed")
+
+
+# 解说位置的键: 类型和决定解说内容的参数
+def slot_key(kind, *parts):
+    return f"{kind}:" + hashlib.md5(json.dumps(parts, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()[:16]
+
+
 # 射门解说词
 def shoot_text():
     return random.choice(['打门！', '射门！'])
\ No newline at end of file
@@ -0,0 +1,211 @@
+import os
+import subprocess
+from scoreboard import find_font
+from encoder import DEFAULT_CODEC, DEFAULT_CRF, DEFAULT_PRESET
+from mixer import VOICE_VOLUME
+
+FILTER_SCRIPT_NAME = 'filter_complex.txt'
+
+
+# 转义滤镜参数值（文字、路径）: 先按滤镜选项转义，再按滤镜图转义，值不加引号
+def escape_value(value):
+    return escape(escape(str(value), "\\':"), "\\'[],;")
+
+
+def escape(text, chars):
+    return ''.join('\\' + c if c in chars else c for c in text)
+
+
+# 检查 ffmpeg 是否带有需要的滤镜（drawtext 需要 libfreetype）
+def require_filters(names):
+    try:
+        output = subprocess.run(['ffmpeg', '-hide_banner', '-filters'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True).stdout
+    except FileNotFoundError:
+        raise RuntimeError("ffmpeg not found, install ffmpeg and add it to PATH")
+    available = {line.split()[1] for line in output.splitlines() if len(line.split()) > 1}
+    missing = [name for name in names if name not in available]
+    if missing:
+        raise RuntimeError(f"ffmpeg is missing filter(s) {', '.join(missing)}; drawtext needs an ffmpeg build with libfreetype")
+
+
+def require_font(path):
+    if not os.path.exists(path):
+        raise RuntimeError(f"font not found: {path} (put the .otf file in fonts/ or set font in the scoreboard config)")
+
+
+def enable_between(start, end):
+    return f"enable='between(t,{start:.3f},{end:.3f})'"
+
+
+# 把比赛时间线转换为一个 ffmpeg filter_complex，一次渲染完整场比赛
+class FilterGraph:
+    def __init__(self, editor, logo_fade):
+        self.editor = editor
+        self.game = editor.game
+        self.logo_fade = logo_fade
+        self.inputs = []
+        self.input_count = 0
+        self.filters = []
+        self.label_count = 0
+
+    def add_input(self, path, options=None):
+        self.inputs.extend((options or []) + ['-i', path])
+        self.input_count += 1
+        return self.input_count - 1
+
+    def label(self, prefix):
+        self.label_count += 1
+        return f"{prefix}{self.label_count}"
+
+    def build(self):
+        self.add_input(self.game.main_video)
+        video = self.build_replays('0:v')
+        video = self.build_scoreboard(video)
+        video = self.build_logos(video)
+        audio = self.build_audio('0:a')
+        return video, audio
+
+    # 重放: 把主视频切成正常片段和慢放片段再拼接
+    def build_replays(self, source):
+        fps = self.editor.fps
+        pieces = []
+        cursor = 0
+        for window in sorted(self.editor.replay_windows, key=lambda w: w.start):
+            if window.start / fps < cursor:
+                continue
+            pieces.append((cursor, window.start / fps, 1))
+            pieces.append((window.source_start / fps, window.source_end / fps, 2))
+            cursor = window.end / fps
+        pieces.append((cursor, None, 1))
+
+        if len(pieces) == 1:
+            return source
+
+        split_labels = [self.label('part') for _ in pieces]
+        self.filters.append(f"[{source}]split={len(pieces)}" + ''.join(f"[{l}]" for l in split_labels))
+        trimmed = []
+        for (start, end, speed), split_label in zip(pieces, split_labels):
+            label = self.label('trim')
+            trim = f"trim=start={start:.6f}" + (f":end={end:.6f}" if end is not None else '')
+            self.filters.append(f"[{split_label}]{trim},setpts={speed}*(PTS-STARTPTS)[{label}]")
+            trimmed.append(label)
+
+        output = self.label('replayed')
+        self.filters.append(''.join(f"[{l}]" for l in trimmed) + f"concat=n={len(trimmed)}:v=1:a=0,fps={fps}[{output}]")
+        return output
+
+    # 记分牌: 底图和文字按比分区间启用
+    def build_scoreboard(self, source):
+        scoreboard = self.game.scoreboard
+        start, end = self.game.start, self.game.end
+        board_width = scoreboard.scoreboard_img.shape[1]
+
+        image_input = self.add_input(scoreboard.img, ['-loop', '1'])
+        output = self.label('board')
+        self.filters.append(f"[{source}][{image_input}:v]overlay=x=(W-w)/2:y=0:shortest=1:{enable_between(start, end)}[{output}]")
+
+        drawtexts = []
+        for key, text in scoreboard.texts.items():
+            if key in ['score0', 'score1']:
+                continue
+            drawtexts.append(self.drawtext(text, scoreboard.textprops.get(key), board_width, start, end))
+
+        updates = self.game.score_updates
+        for i, update in enumerate(updates):
+            update_end = updates[i + 1].time if i + 1 < len(updates) else end
+            interval_start, interval_end = max(update.time, start), min(update_end, end)
+            if interval_end <= interval_start:
+                continue
+            drawtexts.append(self.drawtext(update.score0, scoreboard.textprops.get('score0'), board_width, interval_start, interval_end))
+            drawtexts.append(self.drawtext(update.score1, scoreboard.textprops.get('score1'), board_width, interval_start, interval_end))
+
+        time_textprop = scoreboard.textprops.get('time')
+        if time_textprop is not None:
+            clock = f"%{{eif\\:floor((t-{start:.3f})/60)\\:d\\:2}}\\:%{{eif\\:round(mod(t-{start:.3f}\\,60))\\:d\\:2}}"
+            drawtexts.append(self.drawtext(clock, time_textprop, board_width, start, end, expansion=True))
+
+        drawtexts = [d for d in drawtexts if d]
+        if not drawtexts:
+            return output
+
+        texted = self.label('texts')
+        self.filters.append(f"[{output}]" + ','.join(drawtexts) + f"[{texted}]")
+        return texted
+
+    def drawtext(self, text, textprop, board_width, start, end, expansion=False):
+        if textprop is None:
+            return None
+        # 时钟表达式已经按 drawtext 展开语法转义，加引号原样传入
+        value = f"'{text}'" if expansion else escape_value(text)
+        return (f"drawtext=fontfile={escape_value(find_font(textprop.font))}:text={value}:expansion={'normal' if expansion else 'none'}"
+                f":fontsize={textprop.height}:fontcolor={textprop.color or 'white'}"
+                f":x=(w-{board_width})/2+{textprop.left}:y={textprop.top}:{enable_between(start, end)}")
+
+    # logo 过场: 淡入淡出后叠加在对应时间
+    def build_logos(self, source):
+        logo_times = [row.time for row in self.editor.logos]
+        if not logo_times:
+            return source
+
+        duration = self.editor.sting.duration
+        fade = self.logo_fade
+        width, height = self.editor.frame_size
+        logo_video = escape_value(self.game.logo_video)
+        output = source
+        # 每个过场用单独的 movie 源，overlay 到时间才读取；共用一个输入再 split 时每个分支都要缓存整段解码后的画面
+        for logo_time in logo_times:
+            faded = self.label('sting')
+            self.filters.append(
+                f"movie=filename={logo_video},scale={width}:{height},format=yuva420p,"
+                f"fade=t=in:st=0:d={fade}:alpha=1,fade=t=out:st={duration - fade:.3f}:d={fade}:alpha=1,"
+                f"setpts=PTS-STARTPTS+{logo_time:.3f}/TB[{faded}]")
+            overlaid = self.label('logoed')
+            self.filters.append(f"[{output}][{faded}]overlay=eof_action=pass:{enable_between(logo_time, logo_time + duration)}[{overlaid}]")
+            output = overlaid
+        return output
+
+    # 解说配音按时间延迟后与比赛原声混合
+    def build_audio(self, source):
+        voices = self.editor.plan_comment_voices()
+        if not voices:
+            return source
+
+        labels = [source]
+        for voice in voices:
+            voice_input = self.add_input(voice["path"])
+            label = self.label('voice')
+            delay = int(voice["start"] * 1000)
+            self.filters.append(f"[{voice_input}:a]atrim=duration={voice['duration']:.3f},volume={self.editor.game.mixer.get('voice_volume', VOICE_VOLUME)},adelay={delay}|{delay}[{label}]")
+            labels.append(label)
+
+        output = self.label('mix')
+        self.filters.append(''.join(f"[{l}]" for l in labels) + f"amix=inputs={len(labels)}:duration=first:normalize=0[{output}]")
+        return output
+
+    # 在打开输入之前检查 ffmpeg 滤镜和字体
+    def check(self):
+        textprops = [t for t in self.game.scoreboard.textprops.values() if t is not None]
+        require_filters((['drawtext'] if textprops else []) + (['movie'] if len(self.editor.logos) else []))
+        for textprop in textprops:
+            require_font(find_font(textprop.font))
+
+    def run(self, output):
+        self.check()
+        video, audio = self.build()
+        with open(FILTER_SCRIPT_NAME, 'w', encoding='utf-8') as f:
+            f.write(';\n'.join(self.filters))
+
+        encoder = self.game.encoder
+        command = ['ffmpeg', '-y', '-v', 'error'] + self.inputs + [
+            '-filter_complex_script', FILTER_SCRIPT_NAME,
+            '-map', f"[{video}]" if ':' not in video else video,
+            '-map', f"[{audio}]" if ':' not in audio else audio,
+            '-c:v', encoder.get('codec', DEFAULT_CODEC), '-crf', str(encoder.get('crf', DEFAULT_CRF)), '-preset', encoder.get('preset', DEFAULT_PRESET),
+            '-c:a', 'aac',
+            output
+        ]
+        print(f"rendering with ffmpeg filtergraph: {len(self.filters)} filters, {self.input_count} inputs")
+        try:
+            subprocess.run(command, check=True)
+        finally:
+            os.remove(FILTER_SCRIPT_NAME)
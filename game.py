@@ -2,6 +2,7 @@ from utils import parse_time
 from team import Team
 from event import Event, EventType
 from scoreboard import Scoreboard
+from timeline import Timeline
 import os
 import yaml
 
@@ -23,6 +24,11 @@ class Game:
         self.prev_time = parse_time(obj.get('prev_time', 0))
         self.quarter = obj.get('quarter')
         self.narrator = obj.get('narrator', '云说')
+        self.replay_memory = obj.get('replay_memory', 1024)
+        self.encoder = obj.get('encoder', {})
+        self.mixer = obj.get('mixer', {})
+        self.voice_cache = obj.get('voice_cache', {})
+        self.highlights_comment = obj.get('highlights_comment')
         self.events = Event.load_from_csv(f'events.{game_id}.csv')
         self.comments = []
         self.score_updates = []
@@ -40,15 +46,15 @@ class Game:
         self.score_updates.append(ScoreUpdate(self.start, self.teams[0].score, self.teams[1].score))
 
     def load_start_and_end(self):
+        events = Timeline.from_events(self.events)
         # find the first event with type 'start'
-        for event in self.events:
-            if event.type == EventType.Start:
-                self.start = event.time
-                break
+        start = events.of_type(EventType.Start).first()
+        if start is not None:
+            self.start = start.time
         # find the last event with type 'end'
-        for event in self.events:
-            if event.type == EventType.End:
-                self.end = event.time
+        end = events.of_type(EventType.End).last()
+        if end is not None:
+            self.end = end.time
 
     def update_score(self, time, team=None, score=None):
         if team is not None:
@@ -0,0 +1,129 @@
+import json
+import os
+import pickle
+import sqlite3
+from comment import Comment
+from deadball import Deadball
+from game import ScoreUpdate
+
+SCHEMA_VERSION = 2
+IMPORTED_SUFFIX = '.imported'
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS comments (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    text TEXT,
+    type TEXT,
+    event_id TEXT,
+    event_level INTEGER,
+    slot TEXT
+);
+CREATE INDEX IF NOT EXISTS comments_time ON comments (time);
+CREATE TABLE IF NOT EXISTS score_updates (time REAL NOT NULL, score0 INTEGER, score1 INTEGER);
+CREATE TABLE IF NOT EXISTS deadballs (start REAL NOT NULL, end REAL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+# 比赛分析结果存储 (SQLite, WAL 模式): 解说、比分变化、死球和分析时的事件签名。
+# 可以单独修改一条解说、按时间范围查询，编辑时其它进程仍然可以读取
+class GameStore:
+    def __init__(self, game_id):
+        self.game_id = game_id
+        self.path = f'game.{game_id}.sqlite'
+        self.legacy_path = f'game.{game_id}.pkl'
+        self.db = None
+
+    def connect(self):
+        if self.db is None:
+            self.db = sqlite3.connect(self.path, timeout=30)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            version = self.db.execute("PRAGMA user_version").fetchone()[0]
+            if version > SCHEMA_VERSION:
+                raise RuntimeError(f"{self.path} schema version {version} is newer than supported {SCHEMA_VERSION}")
+            self.db.executescript(SCHEMA)
+            if version == 1:
+                # 版本 1 用 'events' 标记已保存，没有事件签名时存为 'null'
+                self.db.execute("INSERT OR IGNORE INTO meta SELECT 'saved', '1' FROM meta WHERE key = 'events'")
+                self.db.execute("DELETE FROM meta WHERE key = 'events' AND value = 'null'")
+            self.db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            self.db.commit()
+        return self.db
+
+    # 是否已有分析结果
+    def exists(self):
+        if not os.path.exists(self.path) and os.path.exists(self.legacy_path):
+            self.import_legacy()
+        return os.path.exists(self.path) and self.meta('saved') is not None
+
+    # 一次性导入旧的 pickle 文件，导入后改名，clean 之后不会再被导入。
+    # 旧文件没有事件签名时由下一次分析记录当前事件
+    def import_legacy(self):
+        print(f"importing {self.legacy_path} into {self.path}")
+        with open(self.legacy_path, 'rb') as f:
+            game_data = pickle.load(f)
+        self.save(game_data['comments'], game_data['score_updates'], game_data['deadballs'], game_data.get('events'))
+        os.replace(self.legacy_path, self.legacy_path + IMPORTED_SUFFIX)
+
+    # 删除分析结果，包括 WAL 文件和旧的 pickle 文件
+    def remove(self):
+        self.close()
+        for path in [self.path, self.path + '-wal', self.path + '-shm', self.legacy_path, self.legacy_path + IMPORTED_SUFFIX]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    # 整体替换分析结果
+    def save(self, comments, score_updates, deadballs, events):
+        db = self.connect()
+        with db:
+            db.execute("DELETE FROM comments")
+            db.execute("DELETE FROM score_updates")
+            db.execute("DELETE FROM deadballs")
+            db.executemany("INSERT INTO comments (time, text, type, event_id, event_level, slot) VALUES (?, ?, ?, ?, ?, ?)",
+                           [(c.time, c.text, c.type, c.event_id, c.event_level, getattr(c, 'slot', None)) for c in comments])
+            db.executemany("INSERT INTO score_updates VALUES (?, ?, ?)", [(s.time, s.score0, s.score1) for s in score_updates])
+            db.executemany("INSERT INTO deadballs VALUES (?, ?)", [(d.start, d.end) for d in deadballs])
+            db.execute("INSERT OR REPLACE INTO meta VALUES ('saved', '1')")
+            db.execute("DELETE FROM meta WHERE key = 'events'")
+            if events is not None:
+                db.execute("INSERT INTO meta VALUES ('events', ?)", (json.dumps(events, ensure_ascii=False),))
+
+    # 记录分析时的事件签名
+    def set_events(self, events):
+        db = self.connect()
+        with db:
+            db.execute("INSERT OR REPLACE INTO meta VALUES ('events', ?)", (json.dumps(events, ensure_ascii=False),))
+
+    def comments(self, start=None, end=None):
+        query, params = "SELECT id, time, text, type, event_id, event_level, slot FROM comments", []
+        if start is not None or end is not None:
+            query += " WHERE time >= ? AND time < ?"
+            params = [start if start is not None else float('-inf'), end if end is not None else float('inf')]
+        rows = self.connect().execute(query + " ORDER BY time, id", params).fetchall()
+        return [Comment(time, text, type, event_id, event_level, slot, id) for id, time, text, type, event_id, event_level, slot in rows]
+
+    # 修改一条解说
+    def update_comment(self, comment):
+        db = self.connect()
+        with db:
+            db.execute("UPDATE comments SET time = ?, text = ? WHERE id = ?", (comment.time, comment.text, comment.id))
+
+    def score_updates(self):
+        return [ScoreUpdate(*row) for row in self.connect().execute("SELECT time, score0, score1 FROM score_updates ORDER BY rowid")]
+
+    def deadballs(self):
+        return [Deadball(*row) for row in self.connect().execute("SELECT start, end FROM deadballs ORDER BY rowid")]
+
+    # 分析时的事件签名，旧版本导入的结果没有签名时返回 None
+    def events(self):
+        value = self.meta('events')
+        return json.loads(value) if value is not None else None
+
+    def meta(self, key):
+        row = self.connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
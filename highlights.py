@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import cv2
+import numpy as np
+from event import Event, Tag, event_signature
+from editor import REPLAY_BUFFER, HIGHLIGHT_EXTEND, LOGO_FLY, LOGO_STAY
+from replay import SLOW_MOTION
+from sting import StingCache
+from video_index import VideoIndex
+from encoder import FFmpegWriter, AUDIO_RATE
+from audio import PCMReader, decode_audio, to_int16
+from voicer import Voicer
+from mixer import VOICE_VOLUME
+
+HIGHLIGHT_FADE = 0.5
+
+
+# 集锦片段: 源视频的一段，慢放片段没有原声
+class HighlightPiece:
+    def __init__(self, source_start, source_end, slow=1):
+        self.source_start = source_start
+        self.source_end = source_end
+        self.slow = slow
+
+    def to_dict(self):
+        return self.__dict__.copy()
+
+    @classmethod
+    def from_dict(cls, obj):
+        return cls(obj['source_start'], obj['source_end'], obj.get('slow', 1))
+
+
+# 集锦计划: 每个重放事件先正常播放再慢放一次，每个事件开始时插入 logo 过场。
+# key 由事件和集锦解说决定，变化后重新生成计划
+class HighlightPlan:
+    def __init__(self, pieces, voice=None, key=None):
+        self.pieces = pieces
+        self.voice = voice
+        self.key = key
+
+    @classmethod
+    def build(cls, events, voice=None, key=None):
+        pieces = []
+        for event in sorted(events, key=lambda e: e.time):
+            if Tag.Replay not in event.tags:
+                continue
+            pieces.append(HighlightPiece(max(event.time - REPLAY_BUFFER, 0), event.time + REPLAY_BUFFER + HIGHLIGHT_EXTEND))
+            pieces.append(HighlightPiece(max(event.time - REPLAY_BUFFER, 0), event.time + REPLAY_BUFFER, SLOW_MOTION))
+        return cls(pieces, voice, key)
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'key': self.key, 'voice': self.voice, 'pieces': [p.to_dict() for p in self.pieces]}, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            obj = json.load(f)
+        return cls([HighlightPiece.from_dict(p) for p in obj['pieces']], obj.get('voice'), obj.get('key'))
+
+
+# 流式渲染集锦: 只解码需要的源视频区间，逐帧叠加过场和淡入淡出后送入编码器，
+# 音频按块混合，内存占用与集锦数量无关
+class HighlightRenderer:
+    def __init__(self, game, plan, source):
+        self.game = game
+        self.plan = plan
+        self.source = source
+        self.index = VideoIndex.load(source)
+        cap = cv2.VideoCapture(source)
+        self.fps = cap.get(cv2.CAP_PROP_FPS)
+        self.frame_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        cap.release()
+        self.sting = StingCache(game.logo_video, self.frame_size, self.fps, LOGO_FLY, LOGO_STAY) if os.path.exists(game.logo_video) else None
+
+        # 每个片段的源帧区间和输出起始帧
+        self.spans = []
+        output_frame = 0
+        for piece in plan.pieces:
+            first, last = self.index.frame_at(piece.source_start), self.index.frame_at(piece.source_end)
+            self.spans.append((piece, first, last, output_frame))
+            output_frame += (last - first) * piece.slow
+        self.frame_total = output_frame
+        # 每个集锦开始时播放 logo 过场
+        self.sting_frames = [span[3] for span in self.spans if span[0].slow == 1] if self.sting else []
+
+    def render(self, output):
+        print(f"rendering highlights: {len(self.plan.pieces)} pieces, {self.frame_total / self.fps:.1f}s")
+        writer = FFmpegWriter(output, self.fps, self.frame_size, audio=self.audio_chunks(), **self.game.encoder)
+        cap = cv2.VideoCapture(self.source)
+        try:
+            for piece, first, last, output_start in self.spans:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+                for source_frame in range(first, last):
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    # 慢放时同一源帧写出多次
+                    for repeat in range(piece.slow):
+                        output_frame = output_start + (source_frame - first) * piece.slow + repeat
+                        writer.write(self.draw_overlays(output_frame, frame))
+        finally:
+            cap.release()
+            writer.release()
+
+    def draw_overlays(self, output_frame, frame):
+        fade = self.fade(output_frame)
+        sting_time = None
+        for sting_frame in self.sting_frames:
+            if sting_frame <= output_frame < sting_frame + self.sting.duration * self.fps:
+                sting_time = (output_frame - sting_frame) / self.fps
+        if fade >= 1 and sting_time is None:
+            return frame
+
+        frame = frame.copy()
+        if sting_time is not None:
+            self.sting.apply(frame, sting_time)
+        if fade < 1:
+            frame[:] = cv2.convertScaleAbs(frame, alpha=fade)
+        return frame
+
+    # 开头和结尾的淡入淡出
+    def fade(self, output_frame):
+        fade_frames = HIGHLIGHT_FADE * self.fps
+        return min(1.0, output_frame / fade_frames, (self.frame_total - output_frame) / fade_frames)
+
+    def audio_chunks(self):
+        voice = decode_audio(self.plan.voice) * self.game.mixer.get('voice_volume', VOICE_VOLUME) if self.plan.voice else None
+        voice_samples = len(voice) if voice is not None else 0
+        bgm = PCMReader(self.game.bgm, loop=True) if self.game.bgm and os.path.exists(self.game.bgm) else None
+        total_samples = int(self.frame_total / self.fps * AUDIO_RATE)
+        fade_samples = int(HIGHLIGHT_FADE * AUDIO_RATE)
+
+        try:
+            for piece, first, last, output_start in self.spans:
+                sample_start = int(output_start / self.fps * AUDIO_RATE)
+                sample_end = int((output_start + (last - first) * piece.slow) / self.fps * AUDIO_RATE)
+                source = PCMReader(self.source, self.index.frame_time(first), (last - first) / self.fps) if piece.slow == 1 else None
+                try:
+                    for chunk_start in range(sample_start, sample_end, AUDIO_RATE):
+                        size = min(AUDIO_RATE, sample_end - chunk_start)
+                        mixed = np.zeros((size, 2), dtype=np.float32)
+                        if source is not None:
+                            mixed += source.read(size) / 32768
+                        positions = np.arange(chunk_start, chunk_start + size)
+                        # 解说期间静音原声，播放解说
+                        if voice_samples and chunk_start < voice_samples:
+                            speaking = positions < voice_samples
+                            mixed[speaking] = voice[positions[speaking]]
+                        if bgm is not None:
+                            mixed += bgm.read(size) / 32768
+                        gain = np.minimum(1.0, np.minimum(positions / fade_samples, (total_samples - positions) / fade_samples))
+                        yield to_int16(mixed * gain.clip(0, 1)[:, None])
+                finally:
+                    if source is not None:
+                        source.close()
+        finally:
+            if bgm is not None:
+                bgm.close()
+
+
+def create_highlights(game):
+    source = f'game.{game.game_id}.mp4'
+    if not os.path.exists(source):
+        source = game.main_video
+
+    plan_path = f'highlights.{game.game_id}.json'
+    key = plan_key(game)
+    plan = HighlightPlan.load(plan_path) if os.path.exists(plan_path) else None
+    if plan is None or plan.key != key:
+        voice = Voicer(game).make_text_voice(game.highlights_comment) if game.highlights_comment else None
+        plan = HighlightPlan.build(game.events, voice, key)
+        plan.save(plan_path)
+
+    HighlightRenderer(game, plan, source).render(f'highlights.{game.game_id}.mp4')
+
+
+# 集锦计划的键: 事件文件中所有事件的签名和集锦解说。
+# 分析会修改 game.events（进球时间、描述），所以从文件重新读取，键不受分析过程影响
+def plan_key(game):
+    events = Event.load_from_csv(f'events.{game.game_id}.csv')
+    data = {'events': {event.id: event_signature(event) for event in events}, 'comment': game.highlights_comment}
+    return hashlib.md5(json.dumps(data, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
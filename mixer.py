@@ -0,0 +1,64 @@
+import numpy as np
+from encoder import AUDIO_RATE
+from audio import PCMReader, decode_audio, to_int16
+
+VOICE_VOLUME = 2
+DUCK_RAMP = 0.2
+CHUNK_DURATION = 1
+
+
+# 音频混合器: 比赛原声按固定大小的块流式解码，解说配音在开始前解码、结束后释放，按采样偏移叠加，
+# 可选在解说期间压低原声 (duck < 1)。内存只与同时播放的配音有关，与配音总数无关
+class AudioMixer:
+    def __init__(self, main_path, voices, duration, voice_volume=VOICE_VOLUME, duck=1.0, rate=AUDIO_RATE):
+        self.main_path = main_path
+        self.total = int(duration * rate)
+        self.voice_volume = voice_volume
+        self.duck = duck
+        self.rate = rate
+        self.ramp = max(int(DUCK_RAMP * rate), 1)
+        self.voices = [voice for voice in voices if int(voice['duration'] * rate) > 0]
+        self.starts = np.array([int(voice['start'] * rate) for voice in self.voices], dtype=np.int64)
+        self.ends = self.starts + np.array([int(voice['duration'] * rate) for voice in self.voices], dtype=np.int64)
+        self.decoded = {}
+
+    def chunks(self, chunk_size=None):
+        chunk_size = chunk_size or self.rate * CHUNK_DURATION
+        with PCMReader(self.main_path, rate=self.rate) as main:
+            for chunk_start in range(0, self.total, chunk_size):
+                size = min(chunk_size, self.total - chunk_start)
+                mixed = main.read(size).astype(np.float32) / 32768
+                chunk_end = chunk_start + size
+
+                active = np.flatnonzero((self.starts < chunk_end + self.ramp) & (self.ends > chunk_start - self.ramp))
+                if len(active) and self.duck < 1:
+                    mixed *= self.duck_envelope(chunk_start, size, active)[:, None]
+                for i in active:
+                    start = int(self.starts[i])
+                    lo, hi = max(start, chunk_start), min(int(self.ends[i]), chunk_end)
+                    if lo >= hi:
+                        continue
+                    samples = self.voice_samples(i)
+                    hi = min(hi, start + len(samples))
+                    if lo < hi:
+                        mixed[lo - chunk_start:hi - chunk_start] += samples[lo - start:hi - start]
+                # 已经播放完的配音不再需要
+                for i in [i for i in self.decoded if self.ends[i] <= chunk_end]:
+                    del self.decoded[i]
+                yield to_int16(mixed)
+
+    def voice_samples(self, i):
+        samples = self.decoded.get(i)
+        if samples is None:
+            voice = self.voices[i]
+            samples = self.decoded[i] = decode_audio(voice['path'], self.rate)[:self.ends[i] - self.starts[i]] * self.voice_volume
+        return samples
+
+    # 原声增益包络: 解说期间为 duck，前后各有 DUCK_RAMP 秒的线性过渡
+    def duck_envelope(self, chunk_start, size, active):
+        positions = np.arange(chunk_start, chunk_start + size)
+        envelope = np.ones(size, dtype=np.float32)
+        for i in active:
+            distance = np.minimum(positions - (self.starts[i] - self.ramp), (self.ends[i] + self.ramp) - positions)
+            envelope = np.minimum(envelope, 1 - (1 - self.duck) * np.clip(distance / self.ramp, 0, 1))
+        return envelope
@@ -0,0 +1,219 @@
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+import traceback
+from multiprocessing import shared_memory
+import numpy as np
+
+SLOTS_PER_WORKER = 4
+POLL_INTERVAL = 0.1
+
+
+# 流水线渲染: 解码线程 -> 叠加进程池 -> 编码线程，阶段之间用有界队列连接。
+# 帧保存在预先分配的共享内存环中，队列里只传递槽位号和帧号。
+class FramePipeline:
+    def __init__(self, editor, workers, slots=None):
+        self.editor = editor
+        self.workers = workers
+        self.slots = slots or workers * SLOTS_PER_WORKER
+        self.stop = threading.Event()
+        self.errors = []
+        self.processes = []
+        self.stats = {
+            "frames": 0,
+            "decode_stalls": 0,      # 解码等待空闲槽位（下游慢）
+            "decode_stall_time": 0.0,
+            "encode_stalls": 0,      # 编码等待下一帧（上游慢）
+            "encode_stall_time": 0.0,
+            "overlay_queue_depth": 0,
+            "encode_queue_depth": 0,
+            "samples": 0,
+        }
+
+    def run(self, start_frame, end_frame, writer):
+        width, height = self.editor.frame_size
+        shape = (self.slots, height, width, 3)
+        memory = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+        ring = np.ndarray(shape, dtype=np.uint8, buffer=memory.buf)
+
+        free_slots = queue.Queue()
+        for slot in range(self.slots):
+            free_slots.put(slot)
+        overlay_queue = multiprocessing.Queue(self.slots)
+        encode_queue = multiprocessing.Queue(self.slots)
+
+        self.processes = processes = [
+            multiprocessing.Process(target=overlay_worker, args=(self.editor, memory.name, shape, overlay_queue, encode_queue), daemon=True)
+            for _ in range(self.workers)
+        ]
+        decoder = threading.Thread(target=self.stage, args=(self.decode, start_frame, end_frame, ring, free_slots, overlay_queue, encode_queue))
+        encoder = threading.Thread(target=self.stage, args=(self.encode, start_frame, ring, writer, free_slots, encode_queue))
+        started = time.time()
+        try:
+            for process in processes:
+                process.start()
+            decoder.start()
+            encoder.start()
+            decoder.join()
+            for _ in processes:
+                self.put(overlay_queue, None)
+            for process in processes:
+                while process.is_alive() and not self.stop.is_set():
+                    process.join(POLL_INTERVAL)
+            self.check_workers()
+            self.put(encode_queue, None)
+            encoder.join()
+        except PipelineStopped:
+            pass
+        finally:
+            # 出错时各阶段在 POLL_INTERVAL 内退出，叠加进程可能阻塞在队列上，直接结束
+            self.stop.set()
+            for thread in (decoder, encoder):
+                if thread.is_alive():
+                    thread.join()
+            for process in processes:
+                if process.pid is None:
+                    continue
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+            for q in (overlay_queue, encode_queue):
+                q.cancel_join_thread()
+                q.close()
+            del ring
+            memory.close()
+            memory.unlink()
+
+        if self.errors:
+            raise self.errors[0]
+        self.log(time.time() - started)
+        return self.stats
+
+    # 运行一个阶段，出错时记录异常并通知其它阶段停止
+    def stage(self, func, *args):
+        try:
+            func(*args)
+        except PipelineStopped:
+            pass
+        except BaseException as e:
+            self.errors.append(e)
+            self.stop.set()
+
+    # 可以被 stop 打断的队列读写
+    def get(self, q):
+        while True:
+            if self.stop.is_set():
+                raise PipelineStopped()
+            try:
+                return q.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                self.check_workers()
+
+    def put(self, q, item):
+        while True:
+            if self.stop.is_set():
+                raise PipelineStopped()
+            try:
+                q.put(item, timeout=POLL_INTERVAL)
+                return
+            except queue.Full:
+                self.check_workers()
+
+    # 叠加进程异常退出（例如被系统杀掉）时不会再有结果
+    def check_workers(self):
+        for process in self.processes:
+            if process.exitcode not in (None, 0):
+                raise RuntimeError(f"overlay worker exited with code {process.exitcode}")
+
+    def decode(self, start_frame, end_frame, ring, free_slots, overlay_queue, encode_queue):
+        current = {}
+
+        def next_buffer():
+            waited = time.time()
+            try:
+                slot = free_slots.get_nowait()
+            except queue.Empty:
+                self.stats["decode_stalls"] += 1
+                slot = self.get(free_slots)
+                self.stats["decode_stall_time"] += time.time() - waited
+            current["slot"] = slot
+            return ring[slot]
+
+        for frame_index, frame in self.editor.decode_frames(start_frame, end_frame, next_buffer):
+            self.sample(overlay_queue, encode_queue)
+            self.put(overlay_queue, (current["slot"], frame_index))
+
+    def encode(self, start_frame, ring, writer, free_slots, encode_queue):
+        pending = {}
+        next_index = start_frame
+        while True:
+            waited = time.time()
+            try:
+                item = encode_queue.get_nowait()
+            except queue.Empty:
+                self.stats["encode_stalls"] += 1
+                item = self.get(encode_queue)
+                self.stats["encode_stall_time"] += time.time() - waited
+            if item is None:
+                break
+
+            slot, frame_index = item
+            if slot is None:
+                raise RuntimeError(f"overlay worker failed:\n{frame_index}")
+            pending[frame_index] = slot
+            # 叠加进程完成的顺序不定，按帧号顺序写出
+            while next_index in pending:
+                slot = pending.pop(next_index)
+                writer.write(ring[slot])
+                free_slots.put(slot)
+                self.stats["frames"] += 1
+                next_index += 1
+
+        # 所有帧都应已按顺序写出，剩下的帧说明中间有帧丢失
+        if pending:
+            raise RuntimeError(f"pipeline lost frame {next_index}, {len(pending)} later frames not written")
+
+    def sample(self, overlay_queue, encode_queue):
+        try:
+            self.stats["overlay_queue_depth"] += overlay_queue.qsize()
+            self.stats["encode_queue_depth"] += encode_queue.qsize()
+            self.stats["samples"] += 1
+        except NotImplementedError:
+            # macOS 不支持 qsize
+            pass
+
+    def log(self, elapsed):
+        stats = self.stats
+        samples = stats["samples"] or 1
+        logging.info(
+            f"pipeline: {stats['frames']} frames in {elapsed:.1f}s ({stats['frames'] / max(elapsed, 1e-6):.1f} fps), "
+            f"decode stalls {stats['decode_stalls']} ({stats['decode_stall_time']:.1f}s), "
+            f"encode stalls {stats['encode_stalls']} ({stats['encode_stall_time']:.1f}s), "
+            f"avg queue depth overlay {stats['overlay_queue_depth'] / samples:.1f} encode {stats['encode_queue_depth'] / samples:.1f} "
+            f"of {self.slots} slots")
+
+
+class PipelineStopped(Exception):
+    pass
+
+
+# 叠加进程: 直接在共享内存槽位上绘制记分牌和 logo
+def overlay_worker(editor, memory_name, shape, overlay_queue, encode_queue):
+    memory = shared_memory.SharedMemory(name=memory_name)
+    ring = np.ndarray(shape, dtype=np.uint8, buffer=memory.buf)
+    try:
+        while True:
+            item = overlay_queue.get()
+            if item is None:
+                break
+            slot, frame_index = item
+            editor.draw_overlays(frame_index, ring[slot])
+            encode_queue.put(item)
+    except Exception:
+        # 把异常交给编码线程，由 run 抛出
+        encode_queue.put((None, traceback.format_exc()))
+    finally:
+        del ring
+        memory.close()
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from utils import format_time, file_signature
+from filtergraph import escape_value, require_filters, require_font
+from scoreboard import find_font
+from segments import concat_videos
+from mixer import VOICE_VOLUME
+
+PREVIEW_CACHE_DIR = os.path.join('.cache', 'preview')
+PREVIEW_SETTINGS = {
+    'buffer': 2,
+    'fps': 16,
+    'preset': 'ultrafast',
+    'font': 'ROGFonts-Regular_0',
+    'font_size': 24,
+    'voice_volume': VOICE_VOLUME,
+}
+
+
+# 预览片段: 一个事件前后的比赛画面和该时间段内的解说配音
+class PreviewSegment:
+    def __init__(self, index, event, voices, main_video, settings=PREVIEW_SETTINGS):
+        self.index = index
+        self.event = event
+        self.main_video = main_video
+        self.settings = settings
+        self.start = max(event.time - settings['buffer'], 0)
+        self.end = event.time + settings['buffer']
+        self.voices = [row.item for row in voices.overlapping(self.start, self.end)]
+        self.path = os.path.join(PREVIEW_CACHE_DIR, f"{self.key()}.mp4")
+
+    # 缓存键: 事件、解说文字、配音文件和渲染参数
+    def key(self):
+        data = {
+            'index': self.index,
+            'event': [self.event.id, self.event.type.name, self.event.time],
+            'video': [self.main_video, file_signature(self.main_video)],
+            'voices': [[v['comment'].text, v['path'], file_signature(v['path']), v['start'], v['duration']] for v in self.voices],
+            'settings': self.settings,
+        }
+        return hashlib.md5(json.dumps(data, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    @property
+    def cached(self):
+        return os.path.exists(self.path)
+
+    def render(self):
+        settings = self.settings
+        duration = self.end - self.start
+        label = f"event-{self.index}: {self.event.type} {format_time(self.event.time)}"
+        font = find_font(settings['font'])
+
+        command = ['ffmpeg', '-y', '-v', 'error', '-ss', f"{self.start:.3f}", '-t', f"{duration:.3f}", '-i', self.main_video]
+        filters = [
+            f"[0:v]fps={settings['fps']},drawtext=fontfile={escape_value(font)}:text={escape_value(label)}:expansion=none"
+            f":fontsize={settings['font_size']}:fontcolor=white:x=(w-text_w)/2:y=0[v]",
+            f"anullsrc=r=44100:cl=stereo,atrim=duration={duration:.3f}[silence]",
+        ]
+        audio_labels = ['silence']
+        for i, voice in enumerate(self.voices):
+            command += ['-i', voice['path']]
+            # 配音可能在片段开始前就已开始
+            offset = max(self.start - voice['start'], 0)
+            delay = int(max(voice['start'] - self.start, 0) * 1000)
+            filters.append(
+                f"[{i + 1}:a]atrim=start={offset:.3f}:end={voice['duration']:.3f},asetpts=PTS-STARTPTS,"
+                f"volume={settings['voice_volume']},adelay={delay}|{delay},aformat=sample_rates=44100:channel_layouts=stereo[voice{i}]")
+            audio_labels.append(f"voice{i}")
+        filters.append(''.join(f"[{l}]" for l in audio_labels) + f"amix=inputs={len(audio_labels)}:duration=first:normalize=0[a]")
+
+        temp_path = self.path + '.tmp.mp4'
+        command += ['-filter_complex', ';'.join(filters), '-map', '[v]', '-map', '[a]',
+                    '-c:v', 'libx264', '-preset', settings['preset'], '-pix_fmt', 'yuv420p', '-c:a', 'aac', '-ar', '44100', temp_path]
+        subprocess.run(command, check=True)
+        os.replace(temp_path, self.path)
+        return self
+
+
+# 渲染未缓存的片段，再无损拼接为预览视频
+def render_preview(segments, output, workers):
+    if not segments:
+        print("preview: no events to preview")
+        return
+
+    os.makedirs(PREVIEW_CACHE_DIR, exist_ok=True)
+    missing = [s for s in segments if not s.cached]
+    print(f"preview: {len(segments)} segments, {len(segments) - len(missing)} cached, rendering {len(missing)} with {workers} workers")
+    if missing:
+        require_filters(['drawtext'])
+        require_font(find_font(missing[0].settings['font']))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for segment in executor.map(PreviewSegment.render, missing):
+            print(f"rendered preview segment event-{segment.index}")
+    concat_videos([s.path for s in segments], output)
@@ -0,0 +1,140 @@
+import math
+import tempfile
+import cv2
+import numpy as np
+from video_index import VideoIndex
+
+SLOW_MOTION = 2
+
+
+# 重放窗口: 把输出帧号映射到源视频帧号
+class ReplayWindow:
+    def __init__(self, event, fps, buffer):
+        self.event = event
+        # 源视频中 (event.time - buffer, event.time + buffer) 之间的帧
+        self.source_start = math.floor((event.time - buffer) * fps) + 1
+        self.source_end = math.ceil((event.time + buffer) * fps)
+        # 输出中从 replay_time 之后的第一帧开始慢放
+        self.start = math.floor(event.replay_time * fps) + 1
+        self.end = self.start + (self.source_end - self.source_start) * SLOW_MOTION
+
+    def contains(self, frame_index):
+        return self.start <= frame_index < self.end
+
+    def source_frame(self, frame_index):
+        return self.source_start + (frame_index - self.start) // SLOW_MOTION
+
+    def __repr__(self):
+        return f"ReplayWindow(source=[{self.source_start}, {self.source_end}), output=[{self.start}, {self.end}))"
+
+
+# 重放帧读取器: 用独立的解码器按帧号读取源视频帧
+class ReplayReader:
+    def __init__(self, video_path, index=None):
+        self.video_path = video_path
+        self.index = index
+        self.cap = None
+        self.next_index = None
+        self.last_index = None
+        self.last_frame = None
+
+    def read(self, frame_index):
+        if frame_index == self.last_index:
+            return self.last_frame
+
+        if self.cap is None:
+            self.cap = cv2.VideoCapture(self.video_path)
+
+        if frame_index != self.next_index:
+            if self.index is None:
+                self.index = VideoIndex.load(self.video_path)
+            # 目标在当前位置之后且中间没有关键帧时向前解码，比重新定位快
+            if self.next_index is not None and self.next_index < frame_index and self.index.keyframe_before(frame_index) <= self.next_index:
+                while self.next_index < frame_index:
+                    self.cap.grab()
+                    self.next_index += 1
+            else:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+
+        ret, frame = self.cap.read()
+        if not ret:
+            return None
+
+        self.next_index = frame_index + 1
+        self.last_index = frame_index
+        self.last_frame = frame
+        return frame
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+# 重放缓冲: 主解码经过重放源区间时每帧只保存一次，超出内存预算的帧写入内存映射文件。
+# 缓冲中没有的帧（例如并行渲染时源区间在本段之前）由 ReplayReader 重新解码。
+class ReplayBuffer:
+    def __init__(self, video_path, windows, memory_budget, spill_dir='.'):
+        self.windows = sorted(windows, key=lambda w: w.source_start)
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.memory_used = 0
+        self.frames = {}
+        self.spills = {}
+        self.reader = ReplayReader(video_path)
+
+    # 主解码的每一帧都经过这里，属于尚未播放的重放源区间的帧被保存
+    def capture(self, frame_index, frame):
+        for window in self.windows:
+            if window.source_start > frame_index:
+                break
+            if frame_index < window.source_end and window.start > frame_index:
+                self.store(window, frame_index, frame)
+
+    def store(self, window, frame_index, frame):
+        if frame_index in self.frames:
+            return
+        if self.memory_used + frame.nbytes <= self.memory_budget:
+            self.frames[frame_index] = frame.copy()
+            self.memory_used += frame.nbytes
+            return
+
+        spill = self.spills.get(window)
+        if spill is None:
+            spill_file = tempfile.TemporaryFile(dir=self.spill_dir)
+            shape = (window.source_end - window.source_start,) + frame.shape
+            spill = self.spills[window] = np.memmap(spill_file, dtype=frame.dtype, mode='w+', shape=shape)
+        slot = frame_index - window.source_start
+        spill[slot] = frame
+        self.frames[frame_index] = spill[slot]
+
+    # 慢放通过帧号映射实现，同一源帧不复制
+    def read(self, window, frame_index):
+        source_index = window.source_frame(frame_index)
+        frame = self.frames.get(source_index)
+        if frame is None:
+            frame = self.reader.read(source_index)
+        return frame
+
+    # 释放已经播放完的重放窗口
+    def release_finished(self, frame_index):
+        finished = [w for w in self.windows if w.end <= frame_index]
+        if not finished:
+            return
+        self.windows = [w for w in self.windows if w.end > frame_index]
+        needed = set()
+        for window in self.windows:
+            needed.update(range(window.source_start, window.source_end))
+        for window in finished:
+            for source_index in range(window.source_start, window.source_end):
+                if source_index in needed:
+                    continue
+                frame = self.frames.pop(source_index, None)
+                if frame is not None and not isinstance(frame, np.memmap):
+                    self.memory_used -= frame.nbytes
+            # 临时文件在最后一个引用释放后删除
+            self.spills.pop(window, None)
+
+    def release(self):
+        self.release_finished(float('inf'))
+        self.reader.release()
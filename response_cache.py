@@ -0,0 +1,41 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+RESPONSE_CACHE_PATH = os.path.join('.cache', 'llm.sqlite')
+
+
+# AI 回复缓存 (SQLite)，键由模型、提示和相关上下文计算，重新分析时相同的请求不再调用 AI
+class ResponseCache:
+    def __init__(self, path=RESPONSE_CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, model TEXT, prompt TEXT, response TEXT, created REAL)")
+        self.db.commit()
+
+    def key(self, model, *context):
+        return hashlib.md5(json.dumps([model, *context], ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key, model, prompt, response):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", (key, model, prompt, response, time.time()))
+            self.db.commit()
+
+    def delete(self, key):
+        with self.lock:
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,72 @@
+import json
+import logging
+
+INTERRUPT_BUFFER = 0.5
+
+
+# 解说时间线中的一条解说
+class ScheduledVoice:
+    def __init__(self, comment, path, duration):
+        self.comment = comment
+        self.path = path
+        self.start = comment.time
+        self.full_duration = duration
+        self.duration = duration
+        self.action = 'keep'
+
+    @property
+    def end(self):
+        return self.start + self.duration
+
+    def to_dict(self):
+        return {
+            'text': self.comment.text,
+            'event_id': self.comment.event_id,
+            'level': self.comment.event_level,
+            'path': self.path,
+            'start': self.start,
+            'duration': self.duration,
+            'full_duration': self.full_duration,
+            'action': self.action,
+        }
+
+
+# 安排解说配音: 按时间排序后一次扫描，重叠时丢弃低级别的解说，
+# 或截断（与上一条间隔太近时丢弃）上一条解说，得到互不重叠的时间线
+def schedule_comments(comments, voice_info):
+    voices = []
+    for comment in sorted((c for c in comments if c.text), key=lambda c: c.time):
+        info = voice_info(comment.text)
+        voice = ScheduledVoice(comment, info['path'], info['duration'])
+        voices.append(voice)
+        if voice.duration <= 0:
+            voice.action = 'missing'
+
+    timeline = []
+    for voice in voices:
+        if voice.action == 'missing':
+            continue
+        while timeline and voice.start < timeline[-1].end:
+            last = timeline[-1]
+            if (voice.comment.event_level or 0) < (last.comment.event_level or 0):
+                voice.action = 'drop'
+                break
+            if last.start < voice.start - INTERRUPT_BUFFER:
+                last.action = 'truncate'
+                last.duration = voice.start - last.start - INTERRUPT_BUFFER
+            else:
+                last.action = 'drop'
+                timeline.pop()
+        if voice.action == 'keep':
+            timeline.append(voice)
+
+    for voice in voices:
+        if voice.action != 'keep':
+            logging.info(f"{voice.action} comment {voice.comment.text}")
+    return voices, timeline
+
+
+# 写出解说时间线，包含被截断和丢弃的解说
+def save_schedule(voices, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump([v.to_dict() for v in voices], f, ensure_ascii=False, indent=2)
@@ -5,6 +5,11 @@ from moviepy import ImageClip, TextClip, CompositeVideoClip
 from utils import format_time
 
 DEFAULT_FONT = 'SourceHanSansSC-Medium'
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.7
+FONT_THICKNESS = 2
+# 时钟区域按最宽的时间计算，时钟变化时只重画这块区域
+CLOCK_TEMPLATE = '000:00'
 
 
 class TextProp:
@@ -25,6 +30,10 @@ class Scoreboard:
         self.texts = texts
         self.textprops = textprops
         self.scoreboard_img = cv2.imread(img, cv2.IMREAD_UNCHANGED)
+        self.static_layers = {}
+        self.current_layer = None
+        self.current_key = None
+        self.current_clock = None
 
 
     @classmethod
@@ -62,63 +71,123 @@ class Scoreboard:
         return CompositeVideoClip(clips)
 
     def render_frame(self, frame, time, score0, score1):
-        # If scoreboard image has alpha, blend it onto the frame
+        # Place scoreboard at the top center
         sh, sw = self.scoreboard_img.shape[:2]
         fh, fw = frame.shape[:2]
-
-        # Place scoreboard at the top center
         x_offset = (fw - sw) // 2
-        y_offset = 0
-
-        # Prepare overlay
-        overlay = frame
-        # If scoreboard has alpha channel, blend it
-        if self.scoreboard_img.shape[2] == 4:
-            alpha_s = self.scoreboard_img[:, :, 3] / 255.0
-            alpha_l = 1.0 - alpha_s
-            for c in range(0, 3):
-                overlay[y_offset:y_offset+sh, x_offset:x_offset+sw, c] = (
-                    alpha_s * self.scoreboard_img[:, :, c] +
-                    alpha_l * overlay[y_offset:y_offset+sh, x_offset:x_offset+sw, c]
-                )
-        else:
-            overlay[y_offset:y_offset+sh, x_offset:x_offset+sw] = self.scoreboard_img
-
-        # Draw texts (score0, score1, and others)
-        def draw_text(img, text, textprop):
-            if textprop is None:
-                return
-            font_face = cv2.FONT_HERSHEY_SIMPLEX
-            font_scale = 0.7
-            thickness = 2
-            color = (255, 255, 255)  # default white
-            if textprop.color:
-                # Try to parse color string (e.g., "#RRGGBB" or "red")
-                try:
-                    if textprop.color.startswith("#"):
-                        color = tuple(int(textprop.color[i:i+2], 16) for i in (1, 3, 5))[::-1]
-                except Exception:
-                    pass
-            x, y = int(textprop.left + x_offset), int(textprop.top + y_offset + textprop.height)
-            cv2.putText(img, str(text), (x, y), font_face, font_scale, color, thickness, cv2.LINE_AA)
-
-        # Draw scores
-        draw_text(overlay, score0, self.textprops.get('score0'))
-        draw_text(overlay, score1, self.textprops.get('score1'))
-
-        # Draw other texts
-        for key, text in self.texts.items():
-            if key in ['score0', 'score1']:
-                continue
-            textprop = self.textprops.get(key)
-            draw_text(overlay, text, textprop)
 
-        # Draw time if needed
         time_textprop = self.textprops.get('time')
-        if time_textprop is not None:
-            draw_text(overlay, format_time(time, 0), time_textprop)
-
-        return overlay
+        clock = format_time(time, 0) if time_textprop is not None else None
+        premultiplied, inverse_alpha = self.layer(score0, score1, clock)
+
+        # 只处理记分牌所在区域: roi = roi * (255 - a) / 255 + color * a / 255
+        lh, lw = inverse_alpha.shape[:2]
+        left, right = max(x_offset, 0), min(x_offset + lw, fw)
+        bottom = min(lh, fh)
+        if right <= left or bottom <= 0:
+            return frame
+        roi = frame[0:bottom, left:right]
+        inverse_alpha = inverse_alpha[0:bottom, left - x_offset:right - x_offset]
+        premultiplied = premultiplied[0:bottom, left - x_offset:right - x_offset]
+        roi[:] = (roi * inverse_alpha + premultiplied) // 255
+        return frame
+
+    # 合成好的记分牌图层: 比分变化时重建，时钟变化时只重画时钟区域
+    def layer(self, score0, score1, clock):
+        key = (score0, score1)
+        if self.current_key != key:
+            if key not in self.static_layers:
+                self.static_layers[key] = self.build_static_layer(score0, score1)
+            premultiplied, inverse_alpha = self.static_layers[key]
+            self.current_layer = (premultiplied.copy(), inverse_alpha.copy())
+            self.current_key = key
+            self.current_clock = None
+
+        if clock != self.current_clock:
+            static_premultiplied, static_inverse_alpha = self.static_layers[key]
+            premultiplied, inverse_alpha = self.current_layer
+            x0, y0, x1, y1 = text_rect(self.textprops['time'], CLOCK_TEMPLATE, inverse_alpha.shape)
+            premultiplied[y0:y1, x0:x1] = static_premultiplied[y0:y1, x0:x1]
+            inverse_alpha[y0:y1, x0:x1] = static_inverse_alpha[y0:y1, x0:x1]
+            draw_layer_text(self.current_layer, clock, self.textprops['time'], (x0, y0, x1, y1))
+            self.current_clock = clock
+
+        return self.current_layer
+
+    # 底图和除时钟外的文字预先合成为整数预乘alpha图层
+    def build_static_layer(self, score0, score1):
+        sh, sw = self.scoreboard_img.shape[:2]
+        texts = {'score0': score0, 'score1': score1}
+        texts.update({key: text for key, text in self.texts.items() if key not in ['score0', 'score1']})
+        texts = {key: text for key, text in texts.items() if self.textprops.get(key) is not None}
+
+        # 图层要容纳底图和所有文字实际绘制的范围
+        lh, lw = sh, sw
+        sized = [(self.textprops[key], text) for key, text in texts.items()]
+        if self.textprops.get('time') is not None:
+            sized.append((self.textprops['time'], CLOCK_TEMPLATE))
+        for textprop, text in sized:
+            x0, y0, x1, y1 = text_rect(textprop, text)
+            lw, lh = max(lw, x1), max(lh, y1)
+
+        premultiplied = np.zeros((lh, lw, 3), dtype=np.uint16)
+        inverse_alpha = np.full((lh, lw, 1), 255, dtype=np.uint16)
+        board = self.scoreboard_img.astype(np.uint16)
+        if board.shape[2] == 4:
+            alpha = board[:, :, 3:4]
+            premultiplied[0:sh, 0:sw] = board[:, :, 0:3] * alpha
+            inverse_alpha[0:sh, 0:sw] = 255 - alpha
+        else:
+            premultiplied[0:sh, 0:sw] = board[:, :, 0:3] * 255
+            inverse_alpha[0:sh, 0:sw] = 0
+        # 整数除法时四舍五入
+        premultiplied += 127
+
+        layer = (premultiplied, inverse_alpha)
+        for key, text in texts.items():
+            draw_layer_text(layer, text, self.textprops[key], text_rect(self.textprops[key], text, inverse_alpha.shape))
+        return layer
+
+
+# 文字实际绘制的范围: 由字体度量、基线和线宽决定，不受 textprop 宽高限制
+def text_rect(textprop, text, shape=None):
+    (width, height), baseline = cv2.getTextSize(str(text), FONT, FONT_SCALE, FONT_THICKNESS)
+    x, y = int(textprop.left), int(textprop.top + textprop.height)
+    pad = FONT_THICKNESS + 1
+    x0, y0, x1, y1 = max(x - pad, 0), max(y - height - pad, 0), x + width + pad, y + baseline + pad
+    if shape is not None:
+        x1, y1 = min(x1, shape[1]), min(y1, shape[0])
+    return x0, y0, x1, y1
+
+
+# 把文字按抗锯齿覆盖率合成到图层的 rect 区域
+def draw_layer_text(layer, text, textprop, rect):
+    premultiplied, inverse_alpha = layer
+    x0, y0, x1, y1 = rect
+    if x1 <= x0 or y1 <= y0:
+        return
+
+    coverage = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+    x, y = int(textprop.left) - x0, int(textprop.top + textprop.height) - y0
+    cv2.putText(coverage, str(text), (x, y), FONT, FONT_SCALE, 255, FONT_THICKNESS, cv2.LINE_AA)
+    coverage = coverage.astype(np.uint32)[:, :, None]
+
+    color = np.array(text_color(textprop), dtype=np.uint32)
+    region = premultiplied[y0:y1, x0:x1]
+    region[:] = color * coverage + (region.astype(np.uint32) - 127) * (255 - coverage) // 255 + 127
+    inverse_alpha[y0:y1, x0:x1] = inverse_alpha[y0:y1, x0:x1] * (255 - coverage) // 255
+
+
+def text_color(textprop):
+    color = (255, 255, 255)  # default white
+    if textprop.color:
+        # Try to parse color string (e.g., "#RRGGBB" or "red")
+        try:
+            if textprop.color.startswith("#"):
+                color = tuple(int(textprop.color[i:i+2], 16) for i in (1, 3, 5))[::-1]
+        except Exception:
+            pass
+    return color
 
 
 def render_text(text, textprop, time, duration):
@@ -0,0 +1,61 @@
+import bisect
+import os
+import subprocess
+from encoder import AudioFeeder
+from video_index import VideoIndex
+
+
+# 读取视频关键帧时间（来自帧索引）
+def probe_keyframes(video_path):
+    return VideoIndex.load(video_path).keyframe_times().tolist()
+
+
+# 按关键帧把 [0, frame_total) 切分成最多 count 段
+def split_segments(keyframe_times, fps, frame_total, count):
+    targets = [frame_total * i // count for i in range(1, count)]
+    return snap_segments(keyframe_times, fps, frame_total, targets)
+
+
+# 按固定时长切分，切点不随并行数变化，便于缓存
+def split_segments_every(keyframe_times, fps, frame_total, duration):
+    step = max(int(duration * fps), 1)
+    return snap_segments(keyframe_times, fps, frame_total, range(step, frame_total, step))
+
+
+# 把目标切点对齐到最近的关键帧
+def snap_segments(keyframe_times, fps, frame_total, targets):
+    keyframes = sorted(set(round(t * fps) for t in keyframe_times if 0 < round(t * fps) < frame_total))
+    boundaries = [0]
+    for target in targets:
+        if not keyframes:
+            break
+        index = bisect.bisect_left(keyframes, target)
+        nearest = min(keyframes[max(index - 1, 0):index + 1], key=lambda k: abs(k - target))
+        if nearest > boundaries[-1]:
+            boundaries.append(nearest)
+    boundaries.append(frame_total)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+
+# 无损拼接视频片段，可同时混入音频 (PCM 块)
+def concat_videos(paths, output, audio=None):
+    list_file = output + '.txt'
+    with open(list_file, 'w', encoding='utf-8') as f:
+        for path in paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+
+    command = ["ffmpeg", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_file]
+    feeder = AudioFeeder(audio) if audio is not None else None
+    if feeder is not None:
+        command += feeder.input_args() + ["-map", "0:v", "-map", "1:a", "-c:v", "copy", "-c:a", "aac"]
+    else:
+        command += ["-c", "copy"]
+    command += [output, "-y"]
+
+    process = subprocess.Popen(command, pass_fds=feeder.pass_fds() if feeder else ())
+    if feeder is not None:
+        feeder.start()
+        feeder.finish()
+    if process.wait() != 0:
+        raise RuntimeError(f"ffmpeg concat exited with code {process.returncode}")
+    os.remove(list_file)
@@ -0,0 +1,167 @@
+import argparse
+import hashlib
+import json
+import random
+import re
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SECONDS_PER_CHAR = 0.22
+MIN_VOICE_DURATION = 0.5
+COMMENT_WORDS = ['精彩', '传球', '突破', '防守', '反击', '配合', '射门', '扑救', '控球', '推进']
+
+
+# 本地模拟的 AI 和语音合成服务，用于离线测试和性能测试:
+# /v1/chat/completions 兼容 OpenAI，回复由提示决定；/v1/tts 兼容 Fish Audio，返回与文字长度相符的音频。
+# 可以设置延迟、抖动、限流和错误率，随机数使用固定种子，结果可以复现
+class Simulator:
+    def __init__(self, latency=0.5, jitter=0.2, rate=None, error_rate=0.0, tone=False, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate = rate
+        self.error_rate = error_rate
+        self.tone = tone
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.tokens = rate or 0
+        self.updated = time.monotonic()
+        self.audio_cache = {}
+        self.stats = {'requests': 0, 'limited': 0, 'errors': 0}
+
+    # 返回 None 表示正常处理，否则返回错误状态码
+    def admit(self):
+        with self.lock:
+            self.stats['requests'] += 1
+            if self.rate:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens < 1:
+                    self.stats['limited'] += 1
+                    return 429
+                self.tokens -= 1
+            if self.random.random() < self.error_rate:
+                self.stats['errors'] += 1
+                return 500
+            delay = max(self.latency + self.random.uniform(-self.jitter, self.jitter), 0)
+        time.sleep(delay)
+        return None
+
+    def chat(self, body):
+        prompt = body['messages'][-1]['content']
+        if isinstance(prompt, list):
+            prompt = ' '.join(part.get('text', '') for part in prompt)
+        # 批量请求回复 JSON 数组
+        match = re.match(r'以下是(\d+)个', prompt)
+        if match:
+            lines = [line for line in prompt.splitlines() if re.match(r'\d+\. ', line)]
+            content = json.dumps([fake_comment(line) for line in lines[:int(match.group(1))]], ensure_ascii=False)
+        else:
+            content = fake_comment(prompt)
+        prompt_tokens = sum(len(str(m.get('content', ''))) for m in body['messages'])
+        return {
+            'id': 'chatcmpl-' + hashlib.md5(prompt.encode('utf-8')).hexdigest()[:12],
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'simulator'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(content), 'total_tokens': prompt_tokens + len(content)},
+        }
+
+    # 按文字长度生成静音或单音 mp3
+    def tts(self, text):
+        duration = round(max(len(text) * SECONDS_PER_CHAR, MIN_VOICE_DURATION), 1)
+        with self.lock:
+            audio = self.audio_cache.get(duration)
+        if audio is None:
+            source = f"sine=frequency=440:duration={duration}" if self.tone else f"anullsrc=r=44100:cl=mono,atrim=duration={duration}"
+            audio = subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', source, '-f', 'mp3', '-'],
+                                   stdout=subprocess.PIPE, check=True).stdout
+            with self.lock:
+                self.audio_cache[duration] = audio
+        return audio
+
+
+# 由提示决定的解说词
+def fake_comment(prompt):
+    digest = hashlib.md5(prompt.encode('utf-8')).digest()
+    return '，'.join(COMMENT_WORDS[b % len(COMMENT_WORDS)] for b in digest[:4]) + '！'
+
+
+# Fish Audio 的请求体是 msgpack 编码的 TTSRequest
+def tts_text(body, content_type):
+    if 'json' in content_type:
+        return json.loads(body).get('text', '')
+    try:
+        import ormsgpack
+        return ormsgpack.unpackb(body).get('text', '')
+    except ImportError:
+        import msgpack
+        return msgpack.unpackb(body, raw=False).get('text', '')
+
+
+def make_handler(simulator):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            status = simulator.admit()
+            if status is not None:
+                self.send(status, 'application/json', json.dumps({'error': {'message': 'simulated error', 'code': status}}).encode())
+                return
+
+            path = self.path.split('?')[0].rstrip('/')
+            if path.endswith('/chat/completions'):
+                self.send(200, 'application/json', json.dumps(simulator.chat(json.loads(body)), ensure_ascii=False).encode('utf-8'))
+            elif path.endswith('/tts'):
+                self.send(200, 'audio/mpeg', simulator.tts(tts_text(body, self.headers.get('Content-Type', ''))))
+            else:
+                self.send(404, 'application/json', b'{}')
+
+        def send(self, status, content_type, data):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            if status == 429:
+                self.send_header('Retry-After', '1')
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟的 AI 和语音合成服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.5, help='每个请求的平均延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.2, help='延迟的随机抖动范围（秒）')
+    parser.add_argument('--rate', type=float, default=None, help='每秒最多处理的请求数，超出返回 429')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='随机返回 500 的比例')
+    parser.add_argument('--tone', action='store_true', help='生成 440Hz 单音而不是静音')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    simulator = Simulator(args.latency, args.jitter, args.rate, args.error_rate, args.tone, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(simulator))
+    url = f"http://{args.host}:{args.port}"
+    print(f"simulator listening on {url}")
+    print(f"  OPENAI_BASE_URL={url}/v1 OPENAI_API_KEY=simulator")
+    print(f"  FISH_AUDIO_BASE_URL={url} FISH_AUDIO_API_KEY=simulator")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"simulator stats: {simulator.stats}")
+
+
+if __name__ == '__main__':
+    main()
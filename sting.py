@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import cv2
+import numpy as np
+
+STING_CACHE_DIR = os.path.join('.cache', 'stings')
+
+
+# logo 过场缓存: 按 logo 文件内容、目标分辨率、帧率和过场参数生成缓存，
+# 保存已经缩放并预乘淡入淡出系数的过场帧，渲染时按需内存映射加载
+class StingCache:
+    def __init__(self, logo_video, frame_size, fps, fly, stay, cache_dir=STING_CACHE_DIR):
+        self.logo_video = logo_video
+        self.frame_size = frame_size
+        self.fps = fps
+        self.fly = fly
+        self.stay = stay
+        self.cache_dir = cache_dir
+        self.frames = None
+        self.alphas = None
+        self.path = os.path.join(cache_dir, self.key())
+        self.duration = self.load_duration()
+
+    def key(self):
+        md5 = hashlib.md5()
+        with open(self.logo_video, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                md5.update(chunk)
+        width, height = self.frame_size
+        md5.update(f"{width}x{height}@{self.fps}:{self.fly}:{self.stay}".encode('utf-8'))
+        return md5.hexdigest()
+
+    def load_duration(self):
+        if os.path.exists(self.path + '.json'):
+            with open(self.path + '.json', 'r') as f:
+                return json.load(f)['duration']
+
+        cap = cv2.VideoCapture(self.logo_video)
+        duration = cap.get(cv2.CAP_PROP_FRAME_COUNT) / cap.get(cv2.CAP_PROP_FPS)
+        cap.release()
+        return duration
+
+    # 生成缓存（已存在则跳过）
+    def prepare(self):
+        if os.path.exists(self.path + '.json'):
+            return
+
+        cap = cv2.VideoCapture(self.logo_video)
+        logo_fps = cap.get(cv2.CAP_PROP_FPS)
+        logo_frames = []
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            logo_frames.append(frame)
+        cap.release()
+
+        self.duration = len(logo_frames) / logo_fps
+        count = int(self.duration * self.fps)
+        width, height = self.frame_size
+        print(f"baking logo sting {self.logo_video}: {count} frames at {width}x{height}@{self.fps}")
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp.npy"
+        frames = np.lib.format.open_memmap(temp_path, mode='w+', dtype=np.uint8, shape=(count, height, width, 3))
+        alphas = np.zeros(count, dtype=np.float32)
+        for i in range(count):
+            logo_time = i / self.fps
+            logo_frame = logo_frames[min(int(logo_time * logo_fps), len(logo_frames) - 1)]
+            if logo_frame.shape[:2] != (height, width):
+                logo_frame = cv2.resize(logo_frame, (width, height), interpolation=cv2.INTER_AREA)
+            alpha = self.alpha(logo_time)
+            alphas[i] = alpha
+            frames[i] = cv2.convertScaleAbs(logo_frame, alpha=1 - alpha)
+        frames.flush()
+        del frames
+
+        # 先写临时文件再改名，多个任务同时生成时不会读到不完整的缓存
+        os.replace(temp_path, self.path + '.npy')
+        temp_path = f"{self.path}.{os.getpid()}.alpha.tmp.npy"
+        np.save(temp_path, alphas)
+        os.replace(temp_path, self.path + '.alpha.npy')
+        temp_path = f"{self.path}.{os.getpid()}.tmp.json"
+        with open(temp_path, 'w') as f:
+            json.dump({'duration': self.duration, 'frames': count}, f)
+        os.replace(temp_path, self.path + '.json')
+
+    # 画面保留的比例: 过场开始和结束时淡入淡出
+    def alpha(self, logo_time):
+        if logo_time < self.fly / 2:
+            return 1 - logo_time / (self.fly / 2)
+        elif logo_time > self.duration - self.fly / 2:
+            return 1 - (self.duration - logo_time) / (self.fly / 2)
+        return 0
+
+    def load(self):
+        if self.frames is None:
+            self.prepare()
+            self.frames = np.load(self.path + '.npy', mmap_mode='r')
+            self.alphas = np.load(self.path + '.alpha.npy')
+
+    # frame = frame * alpha + logo * (1 - alpha)
+    def apply(self, frame, logo_time):
+        self.load()
+        index = int(logo_time * self.fps)
+        if index < 0 or index >= len(self.frames):
+            return
+        alpha = float(self.alphas[index])
+        if alpha <= 0:
+            frame[:] = self.frames[index]
+        else:
+            cv2.addWeighted(frame, alpha, self.frames[index], 1.0, 0, frame)
+
+    # 并行渲染时不把已加载的帧传给工作进程
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['frames'] = None
+        state['alphas'] = None
+        return state
@@ -0,0 +1,78 @@
+import re
+import shutil
+import subprocess
+import cv2
+import numpy as np
+import pytest
+from clips import smart_cut
+from video_index import VideoIndex
+
+pytestmark = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='ffmpeg not installed')
+
+FPS = 25
+FRAMES = 400
+GOP = 50
+WIDTH, HEIGHT = 320, 240
+BITS = 12
+CELL = 80
+
+
+# 每帧用黑白方块编码自己的帧号，压缩后仍能读出
+def draw_number(number):
+    frame = np.zeros((HEIGHT, WIDTH, 3), np.uint8)
+    for bit in range(BITS):
+        if number >> bit & 1:
+            y, x = bit // 4 * CELL, bit % 4 * CELL
+            frame[y:y + CELL, x:x + CELL] = 255
+    return frame
+
+
+def read_numbers(path):
+    cap = cv2.VideoCapture(path)
+    numbers = []
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        gray = frame.mean(axis=2)
+        numbers.append(sum(1 << bit for bit in range(BITS) if gray[bit // 4 * CELL + CELL // 2, bit % 4 * CELL + CELL // 2] > 128))
+    cap.release()
+    return numbers
+
+
+# 固定 GOP、带 B 帧的源视频
+@pytest.fixture(scope='module')
+def source(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('clips') / 'source.mp4')
+    process = subprocess.Popen(['ffmpeg', '-v', 'error', '-y', '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{WIDTH}x{HEIGHT}', '-r', str(FPS), '-i', '-',
+                                '-f', 'lavfi', '-i', f'sine=d={FRAMES / FPS}', '-c:v', 'libx264', '-preset', 'veryfast', '-g', str(GOP),
+                                '-keyint_min', str(GOP), '-sc_threshold', '0', '-c:a', 'aac', '-shortest', path], stdin=subprocess.PIPE)
+    for number in range(FRAMES):
+        process.stdin.write(draw_number(number).tobytes())
+    process.stdin.close()
+    assert process.wait() == 0
+    return path
+
+
+# 用 showinfo 读取每帧的 PTS 和关键帧标记，不依赖 ffprobe
+def build_index(path):
+    log = subprocess.run(['ffmpeg', '-v', 'info', '-i', path, '-map', '0:v', '-vf', 'showinfo', '-f', 'null', '-'],
+                         capture_output=True, text=True).stderr
+    frames = re.findall(r'pts_time:(\S+).*?iskey:(\d)', log)
+    return VideoIndex(path, np.array([float(pts) for pts, _ in frames]), np.array([key == '1' for _, key in frames]), np.full(len(frames), -1))
+
+
+@pytest.mark.parametrize('start, end', [(5, 12), (4.98, 9.3), (0, 6), (1.01, 1.9), (13, 20)])
+def test_smart_cut_exact_frames(source, tmp_path, start, end):
+    index = build_index(source)
+    assert len(index) == FRAMES
+    output = str(tmp_path / 'clip.mp4')
+
+    smart_cut(index, source, start, end, output)
+
+    first = index.frame_at(start)
+    stop = int(np.searchsorted(index.pts, end, side='left'))
+    numbers = read_numbers(output)
+    # 帧数准确，拼接处没有重复或缺失的帧
+    assert len(numbers) == stop - first
+    assert numbers == list(range(first, stop))
@@ -0,0 +1,17 @@
+import shutil
+import subprocess
+import pytest
+from filtergraph import escape_value
+
+pytestmark = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='ffmpeg not installed')
+
+
+# metadata 滤镜的 value 和 drawtext 的 text 经过同样的滤镜图和选项解析，打印出来检查转义
+@pytest.mark.parametrize('text', ["O'Brien", "银杏队 2:1 樱花队", "a\\b, [c]; d'e:f 100%"])
+def test_escape_value_round_trips_through_filter_script(tmp_path, text):
+    script = tmp_path / 'filter.txt'
+    script.write_text(f"color=s=16x16:d=0.04,metadata=mode=add:key=k:value={escape_value(text)},metadata=mode=print:key=k", encoding='utf-8')
+    result = subprocess.run(['ffmpeg', '-v', 'info', '-filter_complex_script', str(script), '-f', 'null', '-'],
+                            capture_output=True, encoding='utf-8')
+    assert result.returncode == 0, result.stderr
+    assert any(line.endswith(f"k={text}") for line in result.stderr.splitlines())
@@ -0,0 +1,51 @@
+import multiprocessing
+import os
+import pickle
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+
+pytest.importorskip('fish_audio_sdk')
+pytest.importorskip('dashscope')
+
+import editor as editor_module
+from editor import Editor, init_render_worker
+from game import Game
+
+EXAMPLE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'example')
+
+
+def make_game(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    shutil.copy(os.path.join(EXAMPLE_DIR, 'scoreboard.yaml'), 'scoreboard.yaml')
+    shutil.copy(os.path.join(EXAMPLE_DIR, 'scoreboard.png'), 'scoreboard.png')
+    with open('events.test.csv', 'w', encoding='utf-8') as f:
+        f.write("id,type,time,team,player,desc\nstart_1,Start,00:01.0,,,\ngoal_1,Goal,00:10.0,1,9,\nend_1,End,01:00.0,,,\n")
+    return Game('test', {'name': 'test', 'teams': [{'name': 'A', 'color': '红色'}, {'name': 'B', 'color': '蓝色'}]})
+
+
+def render_worker_game_id():
+    return editor_module._render_editor.game.game_id
+
+
+# 渲染子进程通过 initargs 接收剪辑器，其中的 Voicer 持有线程锁
+def test_editor_with_voicer_pickles(tmp_path, monkeypatch):
+    editor = Editor(make_game(tmp_path, monkeypatch))
+    editor.voicer.cache.touch(editor.voicer.voice_path('球进了'))
+
+    restored = pickle.loads(pickle.dumps(editor))
+
+    voicer = restored.voicer
+    for lock in (voicer.cache.lock, voicer.manifest.lock, voicer.limiter.lock, voicer.client.lock):
+        with lock:
+            pass
+    assert voicer.client.session is None
+    assert voicer.voice_path('球进了') == editor.voicer.voice_path('球进了')
+    voicer.limiter.acquire()
+
+
+def test_editor_passes_to_spawned_workers(tmp_path, monkeypatch):
+    editor = Editor(make_game(tmp_path, monkeypatch))
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=init_render_worker, initargs=(editor,)) as executor:
+        assert executor.submit(render_worker_game_id).result(timeout=120) == 'test'
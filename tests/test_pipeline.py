@@ -0,0 +1,84 @@
+import threading
+import time
+import pytest
+from pipeline import FramePipeline
+
+FRAME_SIZE = (16, 8)
+RUN_TIMEOUT = 60
+
+
+# 只生成带帧号的纯色帧的剪辑器
+class FakeEditor:
+    frame_size = FRAME_SIZE
+
+    def __init__(self, fail_overlay_at=None, slow_overlay_at=None):
+        self.fail_overlay_at = fail_overlay_at
+        self.slow_overlay_at = slow_overlay_at
+
+    def decode_frames(self, start_frame, end_frame, next_buffer=None):
+        for frame_index in range(start_frame, end_frame):
+            frame = next_buffer()
+            frame[:] = frame_index % 256
+            yield frame_index, frame
+
+    def draw_overlays(self, frame_index, frame):
+        if frame_index == self.fail_overlay_at:
+            raise ValueError(f"overlay failed at {frame_index}")
+        if frame_index == self.slow_overlay_at:
+            time.sleep(0.5)
+        frame[0, 0] = 255
+
+
+class ListWriter:
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.frames = []
+
+    def write(self, frame):
+        if len(self.frames) == self.fail_at:
+            raise BrokenPipeError("ffmpeg exited")
+        self.frames.append(frame.copy())
+
+
+# 在线程中运行，流水线卡住时测试失败而不是一直等待
+def run_pipeline(editor, writer, frames=200):
+    result = {}
+
+    def target():
+        try:
+            result['stats'] = FramePipeline(editor, 2, slots=4).run(0, frames, writer)
+        except BaseException as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(RUN_TIMEOUT)
+    assert not thread.is_alive(), "pipeline did not finish"
+    return result
+
+
+def test_pipeline_writes_frames_in_order():
+    writer = ListWriter()
+    result = run_pipeline(FakeEditor(), writer)
+    assert 'error' not in result
+    assert [int(frame[1, 1, 0]) for frame in writer.frames] == [i % 256 for i in range(200)]
+    assert all(frame[0, 0, 0] == 255 for frame in writer.frames)
+
+
+# 第一帧最后完成叠加时仍然第一个写出
+def test_pipeline_waits_for_slow_first_frame():
+    writer = ListWriter()
+    result = run_pipeline(FakeEditor(slow_overlay_at=0), writer, frames=20)
+    assert 'error' not in result
+    assert [int(frame[1, 1, 0]) for frame in writer.frames] == list(range(20))
+
+
+def test_pipeline_raises_when_writer_fails():
+    result = run_pipeline(FakeEditor(), ListWriter(fail_at=20))
+    assert isinstance(result.get('error'), BrokenPipeError)
+
+
+def test_pipeline_raises_when_overlay_fails():
+    result = run_pipeline(FakeEditor(fail_overlay_at=50), ListWriter())
+    with pytest.raises(RuntimeError, match="overlay failed at 50"):
+        raise result['error']
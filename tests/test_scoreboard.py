@@ -0,0 +1,71 @@
+import os
+import cv2
+import numpy as np
+import pytest
+from scoreboard import Scoreboard, TextProp, FONT, FONT_SCALE, FONT_THICKNESS
+from utils import format_time
+
+EXAMPLE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'example')
+TEXTPROPS = {
+    'quarter': {'left': 170, 'top': 70, 'width': 30, 'height': 10},
+    'score0': {'left': 12, 'top': 32, 'width': 20, 'height': 20},
+    'score1': {'left': 327, 'top': 32, 'width': 18, 'height': 18, 'color': '#ffcc00'},
+    'team0': {'left': 50, 'top': 30, 'width': 70, 'height': 25},
+    'team1': {'left': 230, 'top': 30, 'width': 70, 'height': 25},
+    'time': {'left': 145, 'top': 30, 'width': 65, 'height': 20},
+}
+
+
+# 原来逐帧合成的实现: 浮点混合底图，再直接在画面上绘制文字
+def reference_render(scoreboard, frame, time, score0, score1):
+    board = scoreboard.scoreboard_img
+    sh, sw = board.shape[:2]
+    x_offset = (frame.shape[1] - sw) // 2
+    if board.shape[2] == 4:
+        alpha_s = board[:, :, 3] / 255.0
+        for c in range(3):
+            frame[0:sh, x_offset:x_offset + sw, c] = alpha_s * board[:, :, c] + (1.0 - alpha_s) * frame[0:sh, x_offset:x_offset + sw, c]
+    else:
+        frame[0:sh, x_offset:x_offset + sw] = board
+
+    def draw_text(text, textprop):
+        if textprop is None:
+            return
+        color = (255, 255, 255)
+        if textprop.color and textprop.color.startswith('#'):
+            color = tuple(int(textprop.color[i:i + 2], 16) for i in (1, 3, 5))[::-1]
+        origin = (int(textprop.left + x_offset), int(textprop.top + textprop.height))
+        cv2.putText(frame, str(text), origin, FONT, FONT_SCALE, color, FONT_THICKNESS, cv2.LINE_AA)
+
+    draw_text(score0, scoreboard.textprops.get('score0'))
+    draw_text(score1, scoreboard.textprops.get('score1'))
+    for key, text in scoreboard.texts.items():
+        if key not in ['score0', 'score1']:
+            draw_text(text, scoreboard.textprops.get(key))
+    draw_text(format_time(time, 0), scoreboard.textprops.get('time'))
+    return frame
+
+
+def make_scoreboard(team0, team1):
+    textprops = {key: TextProp.from_dict(value) for key, value in TEXTPROPS.items()}
+    return Scoreboard(os.path.join(EXAMPLE_DIR, 'scoreboard.png'), {'team0': team0, 'team1': team1, 'quarter': 'Q2'}, textprops)
+
+
+# 长队名、两位数比分和超过 100 分钟的时钟都会超出 textprop 的宽高
+@pytest.mark.parametrize('team0, team1, score0, score1, time', [
+    ('RED TEAM', 'BLUE TEAM', 10, 12, 65),
+    ('A', 'WWWWWWWWW', 0, 99, 6000.4),
+    ('Gyp', 'jqy', 1, 2, 59.6),
+])
+def test_render_frame_matches_full_frame_compositing(team0, team1, score0, score1, time):
+    scoreboard = make_scoreboard(team0, team1)
+    random = np.random.default_rng(0)
+    frame = random.integers(0, 256, (720, 1280, 3), dtype=np.uint8)
+
+    expected = reference_render(scoreboard, frame.copy(), time, score0, score1)
+    # 先渲染另一个时钟，检查时钟区域被完整恢复
+    scoreboard.render_frame(frame.copy(), time - 61, score0, score1)
+    actual = scoreboard.render_frame(frame.copy(), time, score0, score1)
+
+    difference = np.abs(actual.astype(int) - expected.astype(int))
+    assert difference.max() <= 2
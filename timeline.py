@@ -0,0 +1,150 @@
+import numpy as np
+from event import EventType, Tag
+
+EVENT_TYPES = list(EventType)
+TAGS = list(Tag)
+NO_TEAM = -1
+
+
+# 时间线中的一行: 只保存时间线和行号，字段从列中读取
+class TimelineRow:
+    __slots__ = ('timeline', 'index')
+
+    def __init__(self, timeline, index):
+        self.timeline = timeline
+        self.index = index
+
+    @property
+    def time(self):
+        return float(self.timeline.time[self.index])
+
+    @property
+    def type(self):
+        code = self.timeline.type[self.index]
+        return EVENT_TYPES[code] if code >= 0 else None
+
+    @property
+    def team(self):
+        team = int(self.timeline.team[self.index])
+        return team if team != NO_TEAM else None
+
+    @property
+    def level(self):
+        return int(self.timeline.level[self.index])
+
+    @property
+    def duration(self):
+        return float(self.timeline.duration[self.index])
+
+    # 原始对象（事件、解说、比分变化等）
+    @property
+    def item(self):
+        return self.timeline.items[self.index]
+
+    def __repr__(self):
+        return f"TimelineRow(time={self.time}, type={self.type}, item={self.item!r})"
+
+
+# 按时间排序的只读时间线: 时间、类型、球队、级别、标签和时长保存为 numpy 列，
+# 按时间范围和类型的查询都用二分查找，渲染过程中不会被修改
+class Timeline:
+    def __init__(self, items, time, type=None, team=None, level=None, tags=None, duration=None):
+        count = len(items)
+        order = np.argsort(np.asarray(time, dtype=np.float64), kind='stable')
+        self.items = tuple(items[i] for i in order)
+        self.time = freeze(np.asarray(time, dtype=np.float64).reshape(count)[order])
+        self.type = freeze(column(type, count, np.int16, -1)[order])
+        self.team = freeze(column(team, count, np.int8, NO_TEAM)[order])
+        self.level = freeze(column(level, count, np.int16, 0)[order])
+        self.tags = freeze(column(tags, count, np.uint32, 0)[order])
+        self.duration = freeze(column(duration, count, np.float64, 0)[order])
+        self.max_duration = float(self.duration.max()) if count else 0.0
+
+    @classmethod
+    def from_events(cls, events):
+        return cls(
+            events,
+            [e.time for e in events],
+            type=[EVENT_TYPES.index(e.type) for e in events],
+            team=[e.team if e.team is not None else NO_TEAM for e in events],
+            level=[e.type.level for e in events],
+            tags=[tag_mask(e.tags) for e in events],
+        )
+
+    # 解说配音安排 ({"comment", "start", "duration", ...})
+    @classmethod
+    def from_voices(cls, voices):
+        return cls(
+            voices,
+            [v['start'] for v in voices],
+            level=[v['comment'].event_level or 0 for v in voices],
+            duration=[v['duration'] for v in voices],
+        )
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.items)
+        if not 0 <= index < len(self.items):
+            raise IndexError(index)
+        return TimelineRow(self, index)
+
+    def __iter__(self):
+        return (TimelineRow(self, i) for i in range(len(self.items)))
+
+    # start <= time < end 的行
+    def between(self, start, end):
+        lo = int(np.searchsorted(self.time, start, side='left'))
+        hi = int(np.searchsorted(self.time, end, side='left'))
+        return [TimelineRow(self, i) for i in range(lo, hi)]
+
+    # 与 [start, end) 有重叠的区间 (time, time + duration)
+    def overlapping(self, start, end):
+        return [row for row in self.between(start - self.max_duration, end) if row.time + row.duration > start]
+
+    # time 之前（inclusive 时含 time）最近的一行，没有则返回 None
+    def latest_before(self, time, inclusive=False):
+        index = int(np.searchsorted(self.time, time, side='right' if inclusive else 'left')) - 1
+        return TimelineRow(self, index) if index >= 0 else None
+
+    def of_type(self, event_type):
+        return self.subset(self.type == EVENT_TYPES.index(event_type))
+
+    def with_tag(self, tag):
+        return self.subset((self.tags & tag_mask([tag])) != 0)
+
+    # 按条件筛选出新的时间线，仍然有序
+    def subset(self, mask):
+        indices = np.flatnonzero(mask)
+        timeline = Timeline.__new__(Timeline)
+        timeline.items = tuple(self.items[i] for i in indices)
+        for name in ('time', 'type', 'team', 'level', 'tags', 'duration'):
+            setattr(timeline, name, freeze(getattr(self, name)[indices]))
+        timeline.max_duration = float(timeline.duration.max()) if len(indices) else 0.0
+        return timeline
+
+    def first(self):
+        return self[0] if self.items else None
+
+    def last(self):
+        return self[-1] if self.items else None
+
+
+def tag_mask(tags):
+    mask = 0
+    for tag in tags or []:
+        mask |= 1 << TAGS.index(tag)
+    return mask
+
+
+def column(values, count, dtype, default):
+    if values is None:
+        return np.full(count, default, dtype=dtype)
+    return np.asarray(values, dtype=dtype).reshape(count)
+
+
+def freeze(array):
+    array.setflags(write=False)
+    return array
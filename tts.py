@@ -0,0 +1,92 @@
+import logging
+import os
+import random
+import threading
+import time
+from fish_audio_sdk import Session, TTSRequest
+
+TTS_RATE = 2
+TTS_BURST = 4
+TTS_RETRIES = 3
+TTS_BACKOFF = 1
+
+
+# 令牌桶限流: 平均每秒 rate 个请求，最多连续 burst 个
+class RateLimiter:
+    def __init__(self, rate=TTS_RATE, burst=TTS_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    # 线程锁不能序列化，传给子进程时去掉，反序列化后重新创建
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Fish Audio 语音合成，第一次使用时才创建会话。设置 FISH_AUDIO_BASE_URL 可以使用本地模拟服务。
+# provider、model 和 voice 是配音缓存键的一部分
+class FishAudioClient:
+    provider = 'fish_audio'
+
+    def __init__(self, api_key=None, voice=None, model=None, base_url=None):
+        self.api_key = api_key or os.getenv('FISH_AUDIO_API_KEY')
+        self.base_url = base_url or os.getenv('FISH_AUDIO_BASE_URL')
+        self.voice = voice or os.getenv('FISH_AUDIO_MODEL')
+        self.model = model or os.getenv('FISH_AUDIO_BACKEND')
+        self.session = None
+        self.lock = threading.Lock()
+
+    # 会话和线程锁不传给子进程，子进程需要时重新创建
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        state['session'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def synthesize(self, text):
+        with self.lock:
+            if self.session is None:
+                self.session = Session(self.api_key, base_url=self.base_url) if self.base_url else Session(self.api_key)
+        request = TTSRequest(reference_id=self.voice, text=text)
+        if self.model:
+            return self.session.tts(request, backend=self.model)
+        return self.session.tts(request)
+
+
+# 限流后调用 func，失败时按指数退避重试
+def call_with_retries(func, limiter=None, retries=TTS_RETRIES, backoff=TTS_BACKOFF):
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return func()
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * 2 ** attempt * (1 + random.random() / 2)
+            logging.warning(f"request failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
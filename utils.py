@@ -35,3 +35,39 @@ def format_time(seconds, decimal_places=1, use_separator=True):
     width = decimal_places + 3  # 3 = 2 (整数位) + 1 (小数点)
     return f'{minutes:02d}{sep}{seconds:0{width}.{decimal_places}f}'.replace('.', dot)
 
+
+# Description: This function returns the size and modification time of a file, or None if it does not exist.
+def file_signature(path):
+    if not path or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime]
+
+
+# 跨进程文件锁，多个比赛或工作进程共用同一目录时保护索引文件
+class FileLock:
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, 'a+b')
+        if os.name == 'nt':
+            import msvcrt
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *args):
+        if os.name == 'nt':
+            import msvcrt
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        self.file.close()
+        self.file = None
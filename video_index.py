@@ -0,0 +1,101 @@
+import os
+import subprocess
+import numpy as np
+from utils import file_signature
+
+INDEX_VERSION = 1
+
+
+# 视频帧索引: 每帧的 PTS、关键帧标记和字节偏移，按 PTS 排序。
+# 第一次使用时用 ffprobe 读取 packet 生成，保存为视频旁边的 .index.npz，
+# 视频文件大小或修改时间变化后自动重建。
+class VideoIndex:
+    def __init__(self, video_path, pts, keyframe, pos):
+        self.video_path = video_path
+        self.pts = pts
+        self.keyframe = keyframe
+        self.pos = pos
+        self.keyframes = np.flatnonzero(keyframe)
+
+    @classmethod
+    def load(cls, video_path):
+        index_path = cls.index_path(video_path)
+        signature = file_signature(video_path)
+        if os.path.exists(index_path):
+            with np.load(index_path) as data:
+                if data['version'] == INDEX_VERSION and list(data['signature']) == signature:
+                    if len(data['pts']):
+                        return cls(video_path, data['pts'], data['keyframe'], data['pos'])
+
+        index = cls.probe(video_path)
+        np.savez(index_path, version=INDEX_VERSION, signature=np.array(signature, dtype=np.float64),
+                 pts=index.pts, keyframe=index.keyframe, pos=index.pos)
+        return index
+
+    @classmethod
+    def index_path(cls, video_path):
+        return video_path + '.index.npz'
+
+    @classmethod
+    def probe(cls, video_path):
+        print(f"indexing {video_path}")
+        try:
+            result = subprocess.run(
+                [
+                    "ffprobe",
+                    "-v", "error",
+                    "-select_streams", "v:0",
+                    "-show_entries", "packet=pts_time,pos,flags",
+                    "-of", "compact=p=0",
+                    video_path
+                ],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True
+            )
+        except FileNotFoundError:
+            raise RuntimeError("ffprobe not found, install ffmpeg (with ffprobe) and add it to PATH")
+        if result.returncode != 0:
+            raise RuntimeError(f"ffprobe failed to index {video_path}: {result.stderr.strip()}")
+
+        pts, keyframe, pos = [], [], []
+        for line in result.stdout.splitlines():
+            fields = dict(field.split('=', 1) for field in line.strip().split('|') if '=' in field)
+            try:
+                pts.append(float(fields['pts_time']))
+            except (KeyError, ValueError):
+                continue
+            keyframe.append('K' in fields.get('flags', ''))
+            pos.append(int(fields['pos']) if fields.get('pos', 'N/A').isdigit() else -1)
+
+        if not pts:
+            raise RuntimeError(f"ffprobe found no video packets in {video_path}: {result.stderr.strip()}")
+
+        order = np.argsort(pts, kind='stable')
+        return cls(video_path,
+                   np.array(pts, dtype=np.float64)[order],
+                   np.array(keyframe, dtype=bool)[order],
+                   np.array(pos, dtype=np.int64)[order])
+
+    def __len__(self):
+        return len(self.pts)
+
+    # time 时刻显示的帧
+    def frame_at(self, time):
+        return max(int(np.searchsorted(self.pts, time, side='right')) - 1, 0)
+
+    def frame_time(self, frame_index):
+        return float(self.pts[frame_index])
+
+    # frame_index 之前（含）最近的关键帧
+    def keyframe_before(self, frame_index):
+        i = int(np.searchsorted(self.keyframes, frame_index, side='right')) - 1
+        return int(self.keyframes[max(i, 0)])
+
+    # frame_index 之后（含）最近的关键帧，没有则返回 None
+    def keyframe_after(self, frame_index):
+        i = int(np.searchsorted(self.keyframes, frame_index, side='left'))
+        return int(self.keyframes[i]) if i < len(self.keyframes) else None
+
+    def keyframe_times(self):
+        return self.pts[self.keyframes]
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from utils import FileLock
+
+VOICE_CACHE_DIR = 'voices'
+VOICE_CACHE_SIZE = 2048
+VOICE_SUFFIX = '.mp3'
+INDEX_NAME = 'index.json'
+
+
+# 配音缓存: 文件名由服务商、模型、音色和规范化后的文字决定，
+# index.json 记录每个文件的大小和最后访问时间，超过容量 (MB) 时删除最久未使用的文件。
+# 索引的读写在文件锁内进行，多个比赛和进程可以共用同一个缓存目录
+class VoiceCache:
+    def __init__(self, path=VOICE_CACHE_DIR, max_size=VOICE_CACHE_SIZE):
+        self.path = path
+        self.max_size = max_size * 1024 * 1024 if max_size else None
+        self.index_path = os.path.join(path, INDEX_NAME)
+        self.touched = {}
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    # 线程锁不能序列化，传给子进程时去掉，反序列化后重新创建
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def key(self, text, provider, model, voice):
+        data = [provider, model, voice, normalize_text(text)]
+        return hashlib.md5(json.dumps(data, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def voice_path(self, text, provider, model, voice):
+        return os.path.join(self.path, self.key(text, provider, model, voice) + VOICE_SUFFIX)
+
+    # 记录访问，flush 时一起写入索引
+    def touch(self, voice_path):
+        with self.lock:
+            self.touched[os.path.basename(voice_path)] = time.time()
+
+    # 更新访问时间并按 LRU 淘汰，本次访问过的文件不会被删除
+    def flush(self):
+        with self.lock:
+            touched, self.touched = self.touched, {}
+
+        with FileLock(self.index_path + '.lock'):
+            index = self.load_index()
+            for name in os.listdir(self.path):
+                if name.endswith(VOICE_SUFFIX) and name not in index:
+                    index[name] = {'accessed': os.path.getmtime(os.path.join(self.path, name))}
+            for name, accessed in touched.items():
+                index.setdefault(name, {})['accessed'] = max(accessed, index.get(name, {}).get('accessed', 0))
+
+            total = 0
+            for name in list(index):
+                voice_path = os.path.join(self.path, name)
+                if not os.path.exists(voice_path):
+                    del index[name]
+                    continue
+                index[name]['size'] = os.path.getsize(voice_path)
+                total += index[name]['size']
+
+            if self.max_size is not None and total > self.max_size:
+                for name in sorted(index, key=lambda n: index[n]['accessed']):
+                    if total <= self.max_size:
+                        break
+                    if name in touched:
+                        continue
+                    print(f"evicting voice {name}")
+                    os.remove(os.path.join(self.path, name))
+                    total -= index.pop(name)['size']
+
+            self.save_index(index)
+
+    def load_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading voice cache index {self.index_path}: {e}")
+            return {}
+
+    def save_index(self, index):
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2)
+        os.replace(temp_path, self.index_path)
+
+
+# 规范化文字: 统一全角半角、去掉首尾和重复的空白
+def normalize_text(text):
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', text)).strip()
@@ -0,0 +1,91 @@
+import json
+import os
+import subprocess
+import threading
+import numpy as np
+from utils import file_signature, FileLock
+from audio import decode_audio
+from encoder import AUDIO_RATE
+
+MANIFEST_NAME = 'manifest.json'
+
+
+# 配音文件元数据清单: 时长、采样率、声道数和响度 (RMS dBFS)，
+# 按文件名和文件大小、修改时间作为键，文件变化后自动重新读取
+class VoiceManifest:
+    def __init__(self, voice_dir):
+        self.path = os.path.join(voice_dir, MANIFEST_NAME)
+        self.lock = threading.Lock()
+        self.entries = self.load()
+
+    # 线程锁不能序列化，传给渲染子进程时去掉，反序列化后重新创建
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading voice manifest {self.path}: {e}")
+            return {}
+
+    # 返回配音文件的元数据，清单中没有或已过期时读取文件并更新清单
+    def get(self, voice_path):
+        signature = file_signature(voice_path)
+        if signature is None:
+            return None
+
+        name = os.path.basename(voice_path)
+        entry = self.entries.get(name)
+        if entry is not None and entry['signature'] == signature:
+            return entry
+        return self.update(voice_path)
+
+    def update(self, voice_path):
+        entry = probe_voice(voice_path)
+        # 合并其他进程写入的条目后再保存
+        with self.lock, FileLock(self.path + '.lock'):
+            self.entries = {**self.load(), **self.entries, os.path.basename(voice_path): entry}
+            self.save()
+        return entry
+
+    def save(self):
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(temp_path, self.path)
+
+
+def probe_voice(voice_path):
+    result = subprocess.run(
+        [
+            "ffprobe",
+            "-v", "error",
+            "-select_streams", "a:0",
+            "-show_entries", "stream=sample_rate,channels",
+            "-of", "json",
+            voice_path
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    streams = json.loads(result.stdout or '{}').get('streams') or [{}]
+    samples = decode_audio(voice_path)
+    rms = float(np.sqrt(np.mean(np.square(samples)))) if len(samples) else 0.0
+    return {
+        'signature': file_signature(voice_path),
+        'duration': len(samples) / AUDIO_RATE,
+        'sample_rate': int(streams[0].get('sample_rate', 0)),
+        'channels': int(streams[0].get('channels', 0)),
+        'loudness': round(20 * np.log10(rms), 2) if rms > 0 else None,
+    }
@@ -1,21 +1,32 @@
-import subprocess
-import time
 import os
+import threading
 import dashscope
-import hashlib
-from fish_audio_sdk import Session, TTSRequest, Prosody
+from concurrent.futures import ThreadPoolExecutor
+from voice_manifest import VoiceManifest
+from voice_cache import VoiceCache
+from tts import FishAudioClient, RateLimiter, call_with_retries
 
-VOICE_DIR = 'voices'
+TTS_WORKERS = 4
 dashscope.api_key=os.getenv("DASHSCOPE_API_KEY")
-session = Session(os.getenv('FISH_AUDIO_API_KEY'))
 
 class Voicer:
-    def __init__(self, match):
+    def __init__(self, match, client=None, limiter=None):
         self.match = match
+        self.cache = VoiceCache(**match.voice_cache)
+        self.manifest = VoiceManifest(self.cache.path)
+        self.client = client or FishAudioClient()
+        self.limiter = limiter or RateLimiter()
 
-    def make_voice(self):
-        for comment in self.match.comments:
-            self.make_text_voice(comment.text)
+    # 并发合成所有解说配音，相同文字只合成一次
+    def make_voice(self, workers=TTS_WORKERS):
+        texts = list(dict.fromkeys(comment.text for comment in self.match.comments if comment.text))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(self.make_text_voice, texts))
+        self.cache.flush()
+
+    # 流式合成: 解说生成后立即提交，与解说生成同时进行
+    def stream(self, workers=TTS_WORKERS):
+        return VoiceStream(self, workers)
 
     def make_text_voice(self, text):
         if not text:
@@ -23,53 +34,59 @@ class Voicer:
 
         # skip if voice already exists
         voice_path = self.get_voice(text)["path"]
-        print(f"make voice for {text} at {voice_path}")
         if os.path.exists(voice_path) and os.path.getsize(voice_path) > 0:
             print(f"voice already exists for {text} at {voice_path}")
             return voice_path
 
-        if not os.path.exists(VOICE_DIR):
-            os.mkdir(VOICE_DIR)
-
         # generate and save voice
         print(f"generating voice for comment {text} with path {voice_path}")
-        with open(voice_path, 'wb') as f:
-            for chunk in session.tts(TTSRequest(
-                reference_id=os.getenv('FISH_AUDIO_MODEL'),
-                text=text
-            )):
-                f.write(chunk)
-        time.sleep(1)
+        call_with_retries(lambda: self.write_voice(text, voice_path), self.limiter)
+        self.manifest.update(voice_path)
 
         return voice_path
 
+    # 先写入临时文件再重命名，中断时不会留下不完整的配音文件
+    def write_voice(self, text, voice_path):
+        temp_path = f"{voice_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                for chunk in self.client.synthesize(text):
+                    f.write(chunk)
+            os.replace(temp_path, voice_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
     def get_voice(self, text):
-        voice_path = os.path.join(VOICE_DIR, self.voice_name(text))
+        voice_path = self.voice_path(text)
+        self.cache.touch(voice_path)
         if not os.path.exists(voice_path):
             print(f"Voice file not found for {text} at {voice_path}")
             return {"path": voice_path, "duration": 0, "start": 0}
 
-        # Use ffmpeg to get the duration of the audio file
-        try:
-            result = subprocess.run(
-                [
-                    "ffprobe",
-                    "-v", "error",
-                    "-show_entries", "format=duration",
-                    "-of", "default=noprint_wrappers=1:nokey=1",
-                    voice_path
-                ],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            duration = float(result.stdout.strip())
-        except Exception as e:
-            print(f"Error getting duration of {voice_path}: {e}")
+        entry = self.manifest.get(voice_path)
+        if entry is None:
             return {"path": voice_path, "duration": 0, "start": 0}
+        return {"path": voice_path, "duration": entry["duration"], "start": 0}
+
+    def voice_path(self, text):
+        return self.cache.voice_path(text, self.client.provider, self.client.model, self.client.voice)
+
 
-        return {"path": voice_path, "duration": duration, "start": 0}
+# 配音合成队列: submit 提交解说文字后立即返回，finish 等待全部完成
+class VoiceStream:
+    def __init__(self, voicer, workers=TTS_WORKERS):
+        self.voicer = voicer
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.futures = {}
 
-    def voice_name(self, text):
-        return f"{hashlib.md5(text.encode('utf-8')).hexdigest()}.mp3" if text else None
+    def submit(self, comment):
+        if comment.text not in self.futures:
+            self.futures[comment.text] = self.executor.submit(self.voicer.make_text_voice, comment.text)
 
+    def finish(self):
+        self.executor.shutdown(wait=True)
+        self.voicer.cache.flush()
+        for future in self.futures.values():
+            future.result()
+        print(f"voices ready: {len(self.futures)}")